@@ -0,0 +1,232 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from data_store import fetch_data, fetch_recent_data
+
+# Headless batch runner for the dashboard analyses.
+#
+# Runs the same compute code as the pages (strategy sweep, hedging grid, GARCH search,
+# Prophet forecast, portfolio QP, Monte Carlo) over lists of tickers and parameter
+# sets on a process pool, without Streamlit. Every job writes its result table as
+# Parquet and its parameters and summary as JSON:
+#
+#   python batch_runner.py --analysis strategy --tickers AAPL,MSFT --params '{"leverage_factor": 3}'
+#   python batch_runner.py --jobs nightly.json --output-dir results --workers 8
+#
+# A jobs file is a list of {"analysis": ..., "tickers": [...], "params": {...} or [{...}, ...]}.
+
+
+def _date_range(params, default_start):
+    start = pd.Timestamp(params.get('start', default_start))
+    end = pd.Timestamp(params.get('end', pd.Timestamp.today().normalize()))
+    return start, end
+
+
+def run_strategy(tickers, params):
+    from strategy_engine import prepare_strategy_data, sweep_investment
+
+    ticker = tickers[0]
+    start, end = _date_range(params, '2023-04-01')
+    leverage_factor = params.get('leverage_factor', 8)
+    initial_investment = params.get('initial_investment', 10000)
+    threshold_values = np.arange(params.get('min_threshold', -0.10), params.get('max_threshold', 0.0), params.get('threshold_step', 0.01))
+    monthly_addition_values = np.arange(100, params.get('max_monthly_addition', 1000) + 100, params.get('addition_step', 100))
+
+    nasdaq_data = prepare_strategy_data(fetch_data(ticker, start, end), leverage_factor)
+    final_values = sweep_investment(threshold_values, monthly_addition_values, initial_investment, nasdaq_data)
+    table = pd.DataFrame(list(product(threshold_values, monthly_addition_values)), columns=['Threshold', 'Monthly Addition'])
+    table['Final Value'] = final_values.ravel()
+
+    best = table.loc[table['Final Value'].idxmax()]
+    num_years = (end - start).days / 365.25
+    summary = {
+        'threshold': best['Threshold'],
+        'monthly_addition': best['Monthly Addition'],
+        'final_value': best['Final Value'],
+        'cagr': (best['Final Value'] / initial_investment) ** (1 / num_years) - 1,
+    }
+    return table, summary
+
+
+def run_hedging(tickers, params):
+    from hedging_engine import evaluate_hedging_grid
+
+    start, end = _date_range(params, '2021-04-01')
+    data = fetch_data(tickers[0], start, end)
+    table = evaluate_hedging_grid(
+        data['Close'],
+        params.get('nasdaq_value', 4000.0),
+        params.get('total_amount_available', 10000.0),
+        range(1, params.get('max_leverage_nasdaq', 8) + 1),
+        range(1, params.get('max_leverage_inverse', 20) + 1),
+        np.linspace(0.5, 2.0, params.get('hedge_steps', 16)),
+    )
+    return table, table.loc[table['final_value'].idxmax()].to_dict()
+
+
+def run_garch(tickers, params):
+    from garch_search import forecast_volatility, garch_search_space, search_garch_orders, spec_label
+
+    start, end = _date_range(params, '2021-04-01')
+    data = fetch_data(tickers[0], start, end)
+    log_returns = np.log(data['Close'] / data['Close'].shift(1)).dropna()
+    specs = garch_search_space(range(1, params.get('max_p', 3) + 1), range(1, params.get('max_q', 3) + 1),
+                               params.get('models', ['GARCH']), params.get('distributions', ['normal']))
+    # Jobs already run in parallel, so each search stays in its own process
+    table, best_spec, best_fit = search_garch_orders(log_returns, specs, max_workers=1)
+    summary = {
+        'best_model': spec_label(best_spec),
+        'aic': best_fit.aic,
+        'forecast_volatility': forecast_volatility(best_fit, params.get('horizon', 30)).tolist(),
+    }
+    return table, summary
+
+
+def run_prophet(tickers, params):
+    from prophet_cache import fit_prophet_forecast
+
+    start, end = _date_range(params, '2019-04-01')
+    data = fetch_data(tickers[0], start, end)
+    prophet_df = data[['Date', 'Close']].rename(columns={'Date': 'ds', 'Close': 'y'})
+    model_config = params.get('model', {'yearly_seasonality': True, 'weekly_seasonality': True})
+    forecast, _, _ = fit_prophet_forecast(prophet_df, model_config, periods=params.get('periods', 12), freq=params.get('freq', 'M'))
+    table = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+    return table, {'last_forecast': float(table['yhat'].iloc[-1])}
+
+
+def run_portfolio(tickers, params):
+    from portfolio import fetch_stock_data, calculate_returns_and_covariance, factor_covariance, optimize_portfolio, FACTOR_COUNT
+
+    start, end = _date_range(params, '2023-01-01')
+    data = fetch_stock_data(tickers, start, end)
+    returns, mean_returns, cov_matrix = calculate_returns_and_covariance(data)
+    if params.get('covariance_model') == 'factor':
+        cov_matrix = factor_covariance(returns, params.get('factors', FACTOR_COUNT))
+    weights = optimize_portfolio(mean_returns, cov_matrix, params.get('risk_factor', 5))
+    table = pd.DataFrame({'Ticker': list(data.columns), 'Weight': weights})
+    return table, dict(zip(table['Ticker'], table['Weight']))
+
+
+def run_monte_carlo(tickers, params):
+    from monte_carlo_engine import estimate_gbm_parameters, stream_gbm_statistics
+
+    data = fetch_recent_data(tickers[0], years=params.get('history_years', 5))
+    mu, sigma = estimate_gbm_parameters(data['Close'])
+    days_to_simulate = params.get('days_to_simulate', 30)
+    statistics = stream_gbm_statistics(data['Close'].iloc[-1], mu, sigma, days_to_simulate,
+                                       params.get('num_simulations', 100000), seed=params.get('seed', 42))
+    table = pd.DataFrame({'Day': np.arange(days_to_simulate + 1), 'Mean': statistics['mean'], 'Std': statistics['std']})
+    for q, values in statistics['quantiles'].items():
+        table[f'Q{q:.2f}'] = values
+    summary = {key: float(statistics[key]) for key in ('final_mean', 'final_median', 'final_std')}
+    return table, summary
+
+
+# name -> (function, True if the function runs once per ticker, False if once per ticker list)
+ANALYSES = {
+    'strategy': (run_strategy, True),
+    'hedging': (run_hedging, True),
+    'garch': (run_garch, True),
+    'prophet': (run_prophet, True),
+    'portfolio': (run_portfolio, False),
+    'monte_carlo': (run_monte_carlo, True),
+}
+
+
+def expand_jobs(job_specs):
+    """Turn job specs into one job per (ticker, parameter set)."""
+    jobs = []
+    for spec in job_specs:
+        if spec['analysis'] not in ANALYSES:
+            raise ValueError(f"Unknown analysis '{spec['analysis']}', expected one of {sorted(ANALYSES)}")
+        per_ticker = ANALYSES[spec['analysis']][1]
+        param_sets = spec.get('params') or {}
+        param_sets = param_sets if isinstance(param_sets, list) else [param_sets]
+        ticker_groups = [[ticker] for ticker in spec['tickers']] if per_ticker else [list(spec['tickers'])]
+        for tickers, params in product(ticker_groups, param_sets):
+            jobs.append({'analysis': spec['analysis'], 'tickers': tickers, 'params': params})
+    return jobs
+
+
+def job_id(job):
+    digest = hashlib.sha1(json.dumps(job, sort_keys=True, default=str).encode()).hexdigest()[:10]
+    name = job['tickers'][0] if len(job['tickers']) == 1 else f"{len(job['tickers'])}_tickers"
+    return f"{name.replace('^', '').replace('/', '_')}_{digest}"
+
+
+def _to_json(value):
+    if isinstance(value, (np.generic,)):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return str(value)
+
+
+def run_job(job, output_dir):
+    """Run one job and write <output_dir>/<analysis>/<job id>.parquet and .json."""
+    function = ANALYSES[job['analysis']][0]
+    directory = os.path.join(output_dir, job['analysis'])
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, job_id(job))
+
+    start = time.perf_counter()
+    try:
+        table, summary = function(job['tickers'], job['params'])
+    except Exception as e:
+        return {**job, 'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+
+    table.to_parquet(path + '.parquet', index=False)
+    record = {**job, 'status': 'ok', 'seconds': round(time.perf_counter() - start, 3), 'summary': summary}
+    with open(path + '.json', 'w') as f:
+        json.dump(record, f, indent=2, default=_to_json)
+    return {**record, 'output': path + '.parquet'}
+
+
+def run_batch(jobs, output_dir, max_workers=None):
+    """Run all jobs on a process pool and write a manifest of their outcomes."""
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(run_job, jobs, [output_dir] * len(jobs)))
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(results, f, indent=2, default=_to_json)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run dashboard analyses headless over many tickers.")
+    parser.add_argument("--jobs", help="JSON file with a list of job specs")
+    parser.add_argument("--analysis", choices=sorted(ANALYSES))
+    parser.add_argument("--tickers", help="Comma-separated tickers")
+    parser.add_argument("--params", default="{}", help="JSON object, or list of objects, of analysis parameters")
+    parser.add_argument("--output-dir", default="batch_results")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--provider", choices=["yfinance", "replay"], help="Market data provider for the jobs")
+    args = parser.parse_args()
+
+    if args.provider:
+        os.environ['MARKET_DATA_PROVIDER'] = args.provider
+    if args.jobs:
+        with open(args.jobs) as f:
+            job_specs = json.load(f)
+    elif args.analysis and args.tickers:
+        job_specs = [{'analysis': args.analysis, 'tickers': [t.strip() for t in args.tickers.split(',')], 'params': json.loads(args.params)}]
+    else:
+        parser.error("either --jobs or both --analysis and --tickers are required")
+
+    results = run_batch(expand_jobs(job_specs), args.output_dir, args.workers)
+    failed = [result for result in results if result['status'] != 'ok']
+    print(f"{len(results) - len(failed)} of {len(results)} jobs succeeded, results in {args.output_dir}")
+    for result in failed:
+        print(f"  {result['analysis']} {','.join(result['tickers'])}: {result['error']}")
+
+
+if __name__ == "__main__":
+    main()
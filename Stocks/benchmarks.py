@@ -0,0 +1,255 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from market_data import synthetic_ohlcv
+
+# Benchmarks for the project's hot paths on deterministic synthetic price data.
+#
+# Every benchmark runs at several sizes (years of daily bars, or number of tickers),
+# records the best and median wall time over a few repeats plus the peak memory
+# traced by tracemalloc during one extra run, and the results are saved as JSON.
+# A saved file can be used as a baseline for later runs:
+#
+#   python benchmarks.py --output baseline.json
+#   python benchmarks.py --compare baseline.json --tolerance 0.25
+#
+# --quick limits every benchmark to its smallest size and --only to a subset.
+
+TRADING_DAYS_PER_YEAR = 252
+YEARS = (1, 5, 10, 30)
+TICKER_COUNTS = (10, 50, 100, 500)
+
+
+def synthetic_prices(years, ticker='BENCH'):
+    """Daily OHLCV bars with a `Date` column, as the pages get from `fetch_data`."""
+    bars = synthetic_ohlcv(ticker, start='2000-01-03', end=pd.Timestamp('2000-01-03') + pd.offsets.BDay(years * TRADING_DAYS_PER_YEAR - 1))
+    return bars.reset_index()
+
+
+def synthetic_panel(num_tickers, years=2):
+    """Close prices of `num_tickers` synthetic tickers, one column each."""
+    end = pd.Timestamp('2000-01-03') + pd.offsets.BDay(years * TRADING_DAYS_PER_YEAR - 1)
+    return pd.DataFrame({f'T{i:03d}': synthetic_ohlcv(f'T{i:03d}', start='2000-01-03', end=end)['Close'] for i in range(num_tickers)})
+
+
+# Each benchmark: setup(size) -> state, run(state). Only `run` is timed.
+
+def setup_strategy(years):
+    from strategy_engine import prepare_strategy_data
+    return prepare_strategy_data(synthetic_prices(years), 8)
+
+
+def run_simulate_investment(data):
+    from strategy_engine import simulate_investment
+    simulate_investment(-0.02, 10000, 500, data)
+
+
+def run_strategy_sweep(data):
+    from strategy_engine import sweep_investment
+    sweep_investment(np.arange(-0.10, 0.0, 0.001), np.arange(100, 1100, 100), 10000, data)
+
+
+def setup_close(years):
+    return synthetic_prices(years)['Close']
+
+
+def run_hedging_grid(close):
+    from hedging_engine import evaluate_hedging_grid
+    evaluate_hedging_grid(close, 4000.0, 10000.0, range(1, 9), range(1, 21), np.linspace(0.5, 2.0, 16))
+
+
+def run_monte_carlo(num_simulations):
+    from monte_carlo_engine import simulate_gbm_paths
+    simulate_gbm_paths(100.0, 0.0005, 0.015, 365, num_simulations, seed=0)
+
+
+def setup_log_returns(years):
+    close = synthetic_prices(years)['Close']
+    return np.log(close / close.shift(1)).dropna()
+
+
+def run_fit_garch_model(log_returns):
+    from garch_search import build_model
+    build_model(log_returns, ('GARCH', 1, 1, 'normal')).fit(disp='off')
+
+
+def setup_portfolio(num_tickers):
+    from portfolio import calculate_returns_and_covariance
+    _, mean_returns, cov_matrix = calculate_returns_and_covariance(synthetic_panel(num_tickers))
+    return mean_returns, cov_matrix
+
+
+def run_optimize_portfolio(state):
+    from portfolio import optimize_portfolio
+    optimize_portfolio(*state, 5)
+
+
+def run_efficient_frontier(state):
+    from portfolio import efficient_frontier
+    efficient_frontier(*state)
+
+
+def setup_factor_portfolio(num_tickers):
+    from portfolio import calculate_returns_and_covariance, factor_covariance
+    returns, mean_returns, _ = calculate_returns_and_covariance(synthetic_panel(num_tickers))
+    return mean_returns, factor_covariance(returns)
+
+
+def setup_backtest(num_tickers):
+    return synthetic_panel(num_tickers, years=10)
+
+
+def run_rolling_rebalance_backtest(data):
+    from portfolio import rolling_rebalance_backtest
+    rolling_rebalance_backtest(data, 5, 1, 10000, window=126, rebalance_every=5)
+
+
+def setup_screener(num_tickers):
+    return synthetic_panel(num_tickers, years=5)
+
+
+def run_screen_panel(panel):
+    from decision_engine import screen_panel
+    screen_panel(panel)
+
+
+def setup_score_history(years):
+    return synthetic_prices(years).set_index('Date')['Close']
+
+
+def run_score_history(close):
+    from decision_engine import score_history
+    score_history(close)
+
+
+def setup_watchlist(num_tickers):
+    from live_indicators import LiveIndicators
+    panel = synthetic_panel(num_tickers, years=1)
+    return {ticker: LiveIndicators.from_history(panel[ticker]) for ticker in panel.columns}
+
+
+def run_live_update(watchlist):
+    for indicators in watchlist.values():
+        indicators.update(indicators.last_close * 1.001)
+        indicators.scores()
+
+
+def setup_consecutive_days(years):
+    data = synthetic_prices(years)
+    data['Daily Return'] = data['Close'].diff()
+    data['Up'] = data['Daily Return'] > 0
+    return data
+
+
+def run_consecutive_days(data):
+    from log_returns import calculate_consecutive_days
+    calculate_consecutive_days(data, 'Up', 3)
+
+
+BENCHMARKS = {
+    'simulate_investment': (setup_strategy, run_simulate_investment, YEARS),
+    'strategy_sweep': (setup_strategy, run_strategy_sweep, YEARS),
+    'hedging_grid': (setup_close, run_hedging_grid, YEARS),
+    'monte_carlo_simulation': (lambda size: size, run_monte_carlo, (1000, 10000)),
+    'fit_garch_model': (setup_log_returns, run_fit_garch_model, YEARS),
+    'optimize_portfolio': (setup_portfolio, run_optimize_portfolio, TICKER_COUNTS),
+    'efficient_frontier': (setup_portfolio, run_efficient_frontier, TICKER_COUNTS),
+    'optimize_portfolio_factor': (setup_factor_portfolio, run_optimize_portfolio, TICKER_COUNTS),
+    'efficient_frontier_factor': (setup_factor_portfolio, run_efficient_frontier, TICKER_COUNTS),
+    'rolling_rebalance_backtest': (setup_backtest, run_rolling_rebalance_backtest, (10, 50, 100)),
+    'screen_panel': (setup_screener, run_screen_panel, TICKER_COUNTS),
+    'score_history': (setup_score_history, run_score_history, YEARS),
+    'live_indicator_update': (setup_watchlist, run_live_update, TICKER_COUNTS),
+    'calculate_consecutive_days': (setup_consecutive_days, run_consecutive_days, YEARS),
+}
+
+
+def measure(setup, run, size, repeats):
+    state = setup(size)
+    run(state)  # warm-up: imports, caches
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run(state)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'seconds_min': min(timings),
+        'seconds_median': statistics.median(timings),
+        'peak_memory_mb': peak / 1024 ** 2,
+    }
+
+
+def run_benchmarks(names=None, quick=False, repeats=5):
+    results = []
+    for name, (setup, run, sizes) in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        for size in sizes[:1] if quick else sizes:
+            result = {'benchmark': name, 'size': size, **measure(setup, run, size, repeats)}
+            print(f"{name:<28}{size:>8}  {result['seconds_min'] * 1000:>10.2f} ms  {result['peak_memory_mb']:>9.1f} MB")
+            results.append(result)
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'timestamp': pd.Timestamp.now().isoformat(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Benchmarks whose best time regressed by more than `tolerance` against the baseline."""
+    previous = {(row['benchmark'], row['size']): row for row in baseline['results']}
+    regressions = []
+    for row in results:
+        old = previous.get((row['benchmark'], row['size']))
+        if old and row['seconds_min'] > old['seconds_min'] * (1 + tolerance):
+            regressions.append({**row, 'baseline_seconds_min': old['seconds_min'], 'ratio': row['seconds_min'] / old['seconds_min']})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the hot paths on synthetic data.")
+    parser.add_argument("--only", help=f"Comma-separated benchmarks to run, from: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--quick", action="store_true", help="Only the smallest size of each benchmark")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before a regression is reported")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.only.split(',')] if args.only else None
+    results = run_benchmarks(names, args.quick, args.repeats)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for row in regressions:
+            print(f"REGRESSION {row['benchmark']} size={row['size']}: {row['baseline_seconds_min'] * 1000:.2f} ms -> "
+                  f"{row['seconds_min'] * 1000:.2f} ms ({row['ratio']:.2f}x)")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from bulk_download import fetch_close_panel
+from data_store import recent_range
+from instrumentation import span
+
+SECTORS = [
+    'Technology', 'Healthcare', 'Communication Services', 'Consumer Cyclical',
+    'Basic Materials', 'Industrials', 'Energy', 'Financial', 'Real Estate',
+    'Utilities', 'Consumer Defensive'
+]
 
 def fetch_tickers_in_sector(sector):
     # Define the representative ticker for the sector and their respective company names
@@ -21,23 +29,17 @@ def fetch_tickers_in_sector(sector):
     }
     return sector_tickers.get(sector, [])
 
-def calculate_company_performance(ticker, period):
-    data = yf.Ticker(ticker).history(period="1y")
-    start_date = (datetime.now() - timedelta(days=period)).replace(tzinfo=None)
-    data.index = pd.to_datetime(data.index).tz_localize(None)  # Ensure the index is timezone-naive
-    filtered_data = data.loc[start_date:]
-    if len(filtered_data) < 2:
+def calculate_company_performance(close, period):
+    start_date = datetime.now() - timedelta(days=period)
+    filtered_close = close.dropna().loc[start_date:]
+    if len(filtered_close) < 2:
         return None
-    return ((filtered_data['Close'][-1] - filtered_data['Close'][0]) / filtered_data['Close'][0]) * 100
+    return ((filtered_close.iloc[-1] - filtered_close.iloc[0]) / filtered_close.iloc[0]) * 100
 
 def show_best_performing_companies():
     st.title("Best and Worst Performing Companies per Sector")
 
-    sectors = [
-        'Technology', 'Healthcare', 'Communication Services', 'Consumer Cyclical',
-        'Basic Materials', 'Industrials', 'Energy', 'Financial', 'Real Estate',
-        'Utilities', 'Consumer Defensive'
-    ]
+    sectors = SECTORS
 
     period = st.selectbox("Select the period for performance calculation:", ['1 Week', '2 Weeks', '1 Month', '3 Months', '6 Months', '1 Year'])
 
@@ -50,13 +52,23 @@ def show_best_performing_companies():
         '1 Year': 365
     }[period]
 
+    # Fetch one year of dividend-adjusted closes for every company in one concurrent pass
+    all_tickers = [ticker for sector in sectors for ticker, _ in fetch_tickers_in_sector(sector)]
+    start, end = recent_range(years=1)
+    with span('fetch', f'{len(all_tickers)} companies'):
+        close_panel, failures = fetch_close_panel(all_tickers, start, end, column="Adj Close")
+    if failures:
+        st.warning(f"Could not load data for: {', '.join(failures)}")
+
     for sector in sectors:
         st.header(f"{sector} Sector")
         tickers = fetch_tickers_in_sector(sector)
         performances = []
 
         for ticker, company_name in tickers:
-            performance = calculate_company_performance(ticker, period_days)
+            if ticker not in close_panel:
+                continue
+            performance = calculate_company_performance(close_panel[ticker], period_days)
             if performance is not None:
                 performances.append((company_name, performance))
 
@@ -105,7 +117,8 @@ def show_best_performing_companies():
         )
 
         # Display the plot
-        st.plotly_chart(fig, use_container_width=True)
+        with span('render', f'{sector} chart'):
+            st.plotly_chart(fig, use_container_width=True)
 
 if __name__ == "__main__":
     show_best_performing_companies()
\ No newline at end of file
@@ -0,0 +1,100 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from data_store import load_prices, refresh_many
+
+# Concurrent downloads of many tickers at once.
+#
+# The store is first filled in batches: `prefetch` downloads up to DOWNLOAD_CHUNK_SIZE
+# tickers per request. The per-ticker fetches then run on a thread pool (they are I/O
+# bound) and mostly read from disk; they are spaced out by a shared rate limiter,
+# retried with exponential backoff and isolated per ticker, so a ticker missing from a
+# batch is requested on its own and one that keeps failing is reported in `failures`
+# instead of breaking the whole page. `fetch` can be any callable with the signature of
+# `data_store.load_prices` (pass `prefetch=None` unless it reads the same store), which
+# makes it easy to run against a local stand-in provider.
+
+# Tickers per batched download
+DOWNLOAD_CHUNK_SIZE = 50
+
+
+class RateLimiter:
+    """Lets at most `requests_per_second` calls start per second, across threads."""
+
+    def __init__(self, requests_per_second=None):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def fetch_with_retry(fetch, ticker, start, end, limiter, max_retries=3, backoff=0.5):
+    """Call `fetch`, retrying errors and empty answers with exponential backoff."""
+    error = None
+    for attempt in range(max_retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1) * (1 + random.random()))
+        limiter.wait()
+        try:
+            data = fetch(ticker, start, end)
+        except Exception as e:
+            error = e
+            continue
+        if data is not None and not data.empty:
+            return data
+        error = ValueError(f"No data returned for {ticker}")
+    raise error
+
+
+def bulk_fetch(tickers, start, end, fetch=load_prices, prefetch=refresh_many, max_workers=8, max_retries=3, backoff=0.5,
+               requests_per_second=None, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """Fetch every ticker concurrently, after a batched `prefetch` of `chunk_size` tickers at a time.
+
+    Returns a dict of ticker -> frame for the tickers that succeeded and a dict of
+    ticker -> error message for the ones that did not.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    limiter = RateLimiter(requests_per_second)
+    frames, failures = {}, {}
+
+    if prefetch is not None:
+        for i in range(0, len(tickers), chunk_size):
+            limiter.wait()
+            try:
+                prefetch(tickers[i:i + chunk_size], start, end)
+            except Exception:
+                # The tickers of a failed batch are retried one by one below
+                pass
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers) or 1))) as executor:
+        futures = {
+            ticker: executor.submit(fetch_with_retry, fetch, ticker, start, end, limiter, max_retries, backoff)
+            for ticker in tickers
+        }
+        for ticker, future in futures.items():
+            try:
+                frames[ticker] = future.result()
+            except Exception as e:
+                failures[ticker] = str(e)
+
+    return frames, failures
+
+
+def fetch_close_panel(tickers, start, end, column="Close", **kwargs):
+    """Aligned price panel (one column per ticker, in input order) plus the failures."""
+    frames, failures = bulk_fetch(tickers, start, end, **kwargs)
+    panel = pd.DataFrame({ticker: frames[ticker][column] for ticker in tickers if ticker in frames})
+    return panel.sort_index(), failures
@@ -0,0 +1,204 @@
+import json
+import os
+import tempfile
+from urllib.parse import quote
+
+import pandas as pd
+
+from instrumentation import count, span
+from market_data import get_provider
+
+# Local OHLCV store shared by every page.
+#
+# Each ticker is kept as one Parquet file holding the daily bars downloaded so far,
+# next to a small JSON file recording the date range that has been fetched (so that
+# weekends and holidays inside the range are not mistaken for missing data). A request
+# only downloads the parts of the range that are not covered yet and every slice is
+# then served from disk. Downloads go through the active market_data provider, and
+# every provider gets its own subdirectory so replayed data never mixes with real data.
+# `refresh_many` updates many tickers with one batched download per missing range.
+# Store hits and misses are reported to the page instrumentation.
+
+STORE_DIR = os.environ.get("STOCKS_DATA_DIR", os.path.join(os.path.expanduser("~"), ".stockpredictions", "ohlcv"))
+
+
+def default_store_dir():
+    return os.path.join(STORE_DIR, get_provider().name)
+
+
+def _to_timestamp(value):
+    return pd.Timestamp(value).tz_localize(None).normalize()
+
+
+def _ticker_paths(ticker, store_dir):
+    name = quote(ticker, safe="")
+    return os.path.join(store_dir, f"{name}.parquet"), os.path.join(store_dir, f"{name}.json")
+
+
+def _atomic_write(path, write):
+    # Write to a temporary file first so concurrent readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _download(ticker, start, end):
+    with span('fetch', f'download {ticker}'):
+        data = get_provider().download(ticker, start, end)
+    return _normalize_index(data)
+
+
+def _download_many(tickers, start, end):
+    with span('fetch', f'download {len(tickers)} tickers'):
+        frames = get_provider().download_many(tickers, start, end)
+    return {ticker: _normalize_index(frames[ticker]) for ticker in tickers}
+
+
+def _normalize_index(data):
+    data.index = pd.to_datetime(data.index).tz_localize(None)
+    data.index.name = "Date"
+    return data
+
+
+def _read(ticker, store_dir):
+    data_path, coverage_path = _ticker_paths(ticker, store_dir)
+    if not (os.path.exists(data_path) and os.path.exists(coverage_path)):
+        return None, None
+    with open(coverage_path) as f:
+        coverage = json.load(f)
+    coverage = (pd.Timestamp(coverage["start"]), pd.Timestamp(coverage["end"]))
+    return pd.read_parquet(data_path), coverage
+
+
+def _write(ticker, data, coverage, store_dir):
+    os.makedirs(store_dir, exist_ok=True)
+    data_path, coverage_path = _ticker_paths(ticker, store_dir)
+    _atomic_write(data_path, lambda path: data.to_parquet(path))
+
+    def write_coverage(path):
+        with open(path, "w") as f:
+            json.dump({"start": coverage[0].strftime("%Y-%m-%d"), "end": coverage[1].strftime("%Y-%m-%d")}, f)
+
+    _atomic_write(coverage_path, write_coverage)
+
+
+def _missing_ranges(coverage, start, end):
+    """Parts of [start, end) outside the stored coverage."""
+    if coverage is None:
+        return [(start, end)]
+    covered_start, covered_end = coverage
+    missing = []
+    if start < covered_start:
+        missing.append((start, covered_start))
+    if end > covered_end:
+        missing.append((covered_end, end))
+    return missing
+
+
+def _merge(ticker, data, coverage, downloads, store_dir):
+    """Add the downloaded (start, end, bars) pieces to the stored bars, save and return them."""
+    # Today's bar may still change, so coverage never extends past today
+    today = _to_timestamp("today")
+
+    if data is None:
+        (start, end, data), = downloads
+        if data.empty:
+            # Nothing to remember for unknown tickers or ranges without any trading day
+            return data
+        _write(ticker, data, (start, min(end, today)), store_dir)
+        return data
+
+    covered_start, covered_end = coverage
+    pieces = [data]
+    for piece_start, piece_end, piece in downloads:
+        # An empty answer for more than a long weekend is treated as a failed download,
+        # so the range stays uncovered and is requested again next time
+        if piece.empty and (piece_end - piece_start).days > 5:
+            continue
+        pieces.append(piece)
+        covered_start = min(covered_start, piece_start)
+        covered_end = max(covered_end, min(piece_end, today))
+
+    data = pd.concat([piece for piece in pieces if not piece.empty]).sort_index()
+    data = data[~data.index.duplicated(keep="last")]
+    _write(ticker, data, (covered_start, covered_end), store_dir)
+    return data
+
+
+def refresh(ticker, start, end, store_dir=None):
+    """Download the parts of [start, end) not yet in the store and return all stored bars."""
+    store_dir = store_dir or default_store_dir()
+    start, end = _to_timestamp(start), _to_timestamp(end)
+    data, coverage = _read(ticker, store_dir)
+    missing = _missing_ranges(coverage, start, end)
+    count('ohlcv_store', hit=not missing)
+    if not missing:
+        return data
+    downloads = [(piece_start, piece_end, _download(ticker, piece_start, piece_end)) for piece_start, piece_end in missing]
+    return _merge(ticker, data, coverage, downloads, store_dir)
+
+
+def refresh_many(tickers, start, end, store_dir=None):
+    """`refresh` for many tickers, returned as a dict of ticker -> all stored bars.
+
+    Tickers missing the same range (all new tickers, or all tickers last updated on
+    the same day) are downloaded together in one request.
+    """
+    store_dir = store_dir or default_store_dir()
+    start, end = _to_timestamp(start), _to_timestamp(end)
+    stored, ranges = {}, {}
+    for ticker in dict.fromkeys(tickers):
+        data, coverage = _read(ticker, store_dir)
+        missing = _missing_ranges(coverage, start, end)
+        count('ohlcv_store', hit=not missing)
+        stored[ticker] = (data, coverage, [])
+        for piece_range in missing:
+            ranges.setdefault(piece_range, []).append(ticker)
+
+    for (piece_start, piece_end), range_tickers in ranges.items():
+        frames = _download_many(range_tickers, piece_start, piece_end)
+        for ticker in range_tickers:
+            stored[ticker][2].append((piece_start, piece_end, frames[ticker]))
+
+    return {ticker: _merge(ticker, data, coverage, downloads, store_dir) if downloads else data
+            for ticker, (data, coverage, downloads) in stored.items()}
+
+
+def load_prices(ticker, start, end, store_dir=None):
+    """Daily OHLCV bars of `ticker` in [start, end), indexed by date."""
+    return _slice(refresh(ticker, start, end, store_dir), start, end)
+
+
+def _slice(data, start, end):
+    start, end = _to_timestamp(start), _to_timestamp(end)
+    return data[(data.index >= start) & (data.index < end)].copy()
+
+
+def fetch_data(ticker, start, end):
+    """Same frame the pages used to build from `yf.download`, with `Date` as a column."""
+    data = load_prices(ticker, start, end)
+    data.reset_index(inplace=True)
+    return data
+
+
+def recent_range(years=1):
+    """(start, end) covering the last `years` years up to and including today."""
+    end = _to_timestamp("today") + pd.Timedelta(days=1)
+    return end - pd.DateOffset(years=years), end
+
+
+def fetch_recent_data(ticker, years=5):
+    """Bars for the last `years` years up to today, like `yf.download(period=...)`."""
+    start, end = recent_range(years)
+    return load_prices(ticker, start, end)
+
+
+def fetch_price_panel(tickers, start, end, column="Close"):
+    """One column per ticker, aligned on the union of their trading days."""
+    stored = refresh_many(tickers, start, end)
+    return pd.DataFrame({ticker: _slice(stored[ticker], start, end)[column] for ticker in tickers})
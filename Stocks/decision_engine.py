@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+# Composite investment score of the Investment Decision page, for many tickers at once.
+#
+# The score is a weighted average of seven indicators, each normalized to 0-100. The
+# screener computes them for a whole aligned price panel with array operations. Each
+# column is first compacted to the ticker's own trading days (its valid prices moved
+# to the top, in order), so every ticker gets exactly the numbers the single-ticker
+# page computes from its own history, whatever the other tickers' calendars are.
+#
+# `score_history` computes the same score for every date of one ticker, from the data
+# up to that date, with rolling and expanding windows (one pass each), so the score can
+# be charted and traded on.
+
+INDICATORS = ("historical_volatility", "monte_carlo_mean_price", "ma10", "ma50", "ma200", "rsi", "sharpe_ratio")
+
+# Indicator weights for each risk preference (1 = cautious, 5 = aggressive)
+RISK_WEIGHTS = {
+    1: {"historical_volatility": 0.4, "monte_carlo_mean_price": 0.1, "ma10": 0.1, "ma50": 0.1, "ma200": 0.1, "rsi": 0.1, "sharpe_ratio": 0.1},
+    2: {"historical_volatility": 0.3, "monte_carlo_mean_price": 0.1, "ma10": 0.1, "ma50": 0.1, "ma200": 0.1, "rsi": 0.1, "sharpe_ratio": 0.2},
+    3: {"historical_volatility": 0.2, "monte_carlo_mean_price": 0.15, "ma10": 0.1, "ma50": 0.1, "ma200": 0.1, "rsi": 0.1, "sharpe_ratio": 0.25},
+    4: {"historical_volatility": 0.1, "monte_carlo_mean_price": 0.2, "ma10": 0.1, "ma50": 0.1, "ma200": 0.1, "rsi": 0.1, "sharpe_ratio": 0.3},
+    5: {"historical_volatility": 0.05, "monte_carlo_mean_price": 0.25, "ma10": 0.1, "ma50": 0.1, "ma200": 0.1, "rsi": 0.1, "sharpe_ratio": 0.3},
+}
+
+
+def normalize_value(value, min_value, max_value, inverse=False):
+    """Normalize the value to a 0-100 scale."""
+    normalized = (value - min_value) / (max_value - min_value) * 100
+    if inverse:
+        return 100 - normalized
+    return normalized
+
+
+def compact_panel(panel):
+    """Move each column's valid prices to the top, in order; returns the array and the count per column."""
+    prices = panel.to_numpy(dtype=float)
+    valid = ~np.isnan(prices)
+    order = np.argsort(~valid, axis=0, kind='stable')
+    return np.take_along_axis(prices, order, axis=0), valid.sum(axis=0)
+
+
+def _last_window_mean(values, counts, window):
+    """Mean of the last `window` valid rows of every column (NaN when there are fewer)."""
+    sums = np.vstack([np.zeros(values.shape[1]), np.nancumsum(values, axis=0)])
+    columns = np.arange(values.shape[1])
+    start = np.maximum(counts - window, 0)
+    means = (sums[counts, columns] - sums[start, columns]) / window
+    return np.where(counts >= window, means, np.nan)
+
+
+def panel_indicators(panel, rsi_window=14):
+    """Raw indicator values of every ticker (column) of a price panel, one row per ticker."""
+    prices, counts = compact_panel(panel)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = prices[1:] / prices[:-1] - 1
+        # First difference of each ticker is NaN, as in `calculate_rsi`, and counts as no gain and no loss
+        delta = np.vstack([np.zeros(prices.shape[1]), np.diff(prices, axis=0)])
+        average_gain = _last_window_mean(np.clip(delta, 0, None), counts, rsi_window)
+        average_loss = _last_window_mean(np.clip(-delta, 0, None), counts, rsi_window)
+        rsi = 100 - 100 / (1 + average_gain / average_loss)
+
+        mean_return = np.nanmean(returns, axis=0)
+        std_return = np.nanstd(returns, axis=0, ddof=1)
+        return pd.DataFrame({
+            'historical_volatility': std_return * np.sqrt(252) * 100,
+            'monte_carlo_mean_price': np.nanmean(prices, axis=0),
+            'max_price': np.nanmax(prices, axis=0),
+            'ma10': _last_window_mean(prices, counts, 10),
+            'ma50': _last_window_mean(prices, counts, 50),
+            'ma200': _last_window_mean(prices, counts, 200),
+            'rsi': rsi,
+            'sharpe_ratio': mean_return / std_return * np.sqrt(252),
+        }, index=panel.columns)
+
+
+def normalize_indicators(indicators):
+    """The 0-100 normalization of the Investment Decision page, applied to every row."""
+    max_price = indicators['max_price']
+    return pd.DataFrame({
+        'historical_volatility': normalize_value(indicators['historical_volatility'], 0, 100, inverse=True),  # lower is better
+        'monte_carlo_mean_price': normalize_value(indicators['monte_carlo_mean_price'], 0, max_price),
+        'ma10': normalize_value(indicators['ma10'], 0, max_price),
+        'ma50': normalize_value(indicators['ma50'], 0, max_price),
+        'ma200': normalize_value(indicators['ma200'], 0, max_price),
+        'rsi': normalize_value(indicators['rsi'], 0, 100, inverse=True),
+        'sharpe_ratio': normalize_value(indicators['sharpe_ratio'], -2, 5),  # -2 to 5 as reasonable range
+    }, index=indicators.index)[list(INDICATORS)]
+
+
+def composite_scores(normalized):
+    """Composite score of every row for each of the five risk preferences."""
+    weights = np.array([[RISK_WEIGHTS[risk][name] for risk in RISK_WEIGHTS] for name in INDICATORS])
+    scores = normalized.to_numpy() @ (weights / weights.sum(axis=0))
+    return pd.DataFrame(scores, index=normalized.index, columns=[f'Score (risk {risk})' for risk in RISK_WEIGHTS])
+
+
+def screen_panel(panel, risk_preference=3):
+    """Ranked screener table: raw indicators and the composite score for every risk preference.
+
+    Rows are sorted by the score of `risk_preference`, best first; tickers with too
+    little history for the 200-day average have no score and come last.
+    """
+    indicators = panel_indicators(panel.dropna(axis=1, how='all'))
+    table = pd.concat([
+        indicators.drop(columns='max_price').rename(columns={
+            'historical_volatility': 'Volatility (%)', 'monte_carlo_mean_price': 'Mean Price', 'ma10': 'MA10', 'ma50': 'MA50',
+            'ma200': 'MA200', 'rsi': 'RSI', 'sharpe_ratio': 'Sharpe Ratio'}),
+        composite_scores(normalize_indicators(indicators)),
+    ], axis=1)
+    table.index.name = 'Ticker'
+    return table.sort_values(f'Score (risk {risk_preference})', ascending=False)
+
+
+def rsi_series(close, window=14):
+    """Simple-average RSI of every date, as `calculate_rsi` computes for the last one."""
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0).fillna(0)
+    loss = (-delta.where(delta < 0, 0)).fillna(0)
+    rs = gain.rolling(window=window).mean() / loss.rolling(window=window).mean()
+    return 100 - 100 / (1 + rs)
+
+
+def score_history(close, rsi_window=14):
+    """Indicators, normalized values and composite scores (all risk preferences) of every date.
+
+    Each date only uses the prices up to that date: the volatility, mean price, maximum
+    and Sharpe ratio are expanding windows and the moving averages and RSI rolling
+    ones. The last row equals the score of the single-ticker page.
+    """
+    close = close.dropna()
+    returns = close.pct_change()
+    mean_return = returns.expanding(min_periods=2).mean()
+    std_return = returns.expanding(min_periods=2).std()
+    indicators = pd.DataFrame({
+        'historical_volatility': std_return * np.sqrt(252) * 100,
+        'monte_carlo_mean_price': close.expanding().mean(),
+        'max_price': close.cummax(),
+        'ma10': close.rolling(window=10).mean(),
+        'ma50': close.rolling(window=50).mean(),
+        'ma200': close.rolling(window=200).mean(),
+        'rsi': rsi_series(close, rsi_window),
+        'sharpe_ratio': mean_return / std_return * np.sqrt(252),
+    })
+    normalized = normalize_indicators(indicators)
+    return pd.concat([normalized, composite_scores(normalized)], axis=1)
+
+
+def score_signal(scores, buy_above=60, sell_below=40):
+    """Position (1 invested, 0 out) from a score series: buy on a positive outlook, sell on a negative one.
+
+    A neutral score keeps the previous position. The position is taken at the close, so
+    it earns the next day's return.
+    """
+    position = pd.Series(np.where(scores > buy_above, 1.0, np.where(scores < sell_below, 0.0, np.nan)), index=scores.index)
+    return position.ffill().fillna(0.0)
+
+
+def signal_backtest(close, position):
+    """Growth of 1 invested following `position`, next to buying and holding."""
+    returns = close.pct_change().fillna(0)
+    return pd.DataFrame({
+        'Signal': (1 + position.shift(1).fillna(0) * returns).cumprod(),
+        'Buy and Hold': (1 + returns).cumprod(),
+    })
@@ -0,0 +1,156 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+import pandas as pd
+from arch import arch_model
+from arch.univariate import EGARCH
+
+# Order search for the volatility models in volatility_prediction.py.
+#
+# Specifications are fitted in waves of increasing total order p + q, and each of them
+# is warm-started from the fitted parameters of its nested parent in the previous wave
+# ((p-1, q) or (p, q-1) of the same family), with the extra ARCH/GARCH coefficient
+# starting at 0. A nested model can always match its parent, so a warm fit that does
+# not improve on the parent's likelihood (or does not converge) has usually stalled at
+# the parent's optimum; it is refitted from arch's own starting values and the better
+# of the two is kept. Large searches run each wave on a
+# process pool; for a few models starting the pool costs more than it saves.
+#
+# Models are fitted to returns in percent, the scale arch's optimizer expects, so
+# conditional volatilities and residuals of a fitted model are in percent as well.
+
+# Returns are multiplied by this before fitting
+RETURN_SCALE = 100
+# A warm fit must beat its parent's log-likelihood by more than this to skip the cold refit
+LIKELIHOOD_TOLERANCE = 1e-3
+# Fit on a process pool only from this many specifications on
+MIN_PARALLEL_SPECS = 32
+
+# Display name -> (arch `vol` argument, asymmetric order `o`)
+VOLATILITY_MODELS = {
+    'GARCH': ('GARCH', 0),
+    'GJR-GARCH': ('GARCH', 1),
+    'EGARCH': ('EGARCH', 1),
+}
+
+DISTRIBUTIONS = {
+    'normal': 'Normal',
+    't': 'Student-t',
+    'skewt': 'Skewed Student-t',
+}
+
+
+def garch_search_space(p_values=range(1, 4), q_values=range(1, 4), models=('GARCH',), distributions=('normal',)):
+    """All (model, p, q, distribution) specifications to try."""
+    return [(model, p, q, dist) for model, dist, p, q in product(models, distributions, p_values, q_values)]
+
+
+def spec_label(spec):
+    model, p, q, dist = spec
+    return f"{model}({p}, {q}) {DISTRIBUTIONS[dist]}"
+
+
+def build_model(returns, spec):
+    model, p, q, dist = spec
+    vol, o = VOLATILITY_MODELS[model]
+    return arch_model(returns * RETURN_SCALE, vol=vol, p=p, o=o, q=q, dist=dist)
+
+
+def forecast_volatility(fit, horizon):
+    """Volatility forecast of the unscaled returns for each of the next `horizon` days.
+
+    EGARCH has analytic forecasts only one step ahead; longer ones are simulated.
+    """
+    if horizon > 1 and isinstance(fit.model.volatility, EGARCH):
+        forecast = fit.forecast(horizon=horizon, method='simulation', random_state=np.random.RandomState(0))
+    else:
+        forecast = fit.forecast(horizon=horizon)
+    return forecast.variance.values[-1, :] ** 0.5 / RETURN_SCALE
+
+
+def nested_starting_values(parent_params, parent_spec, spec):
+    """Parent parameters with a zero inserted for the added alpha or beta coefficient."""
+    model, p, q, _ = spec
+    o = VOLATILITY_MODELS[model][1]
+    _, parent_p, parent_q, _ = parent_spec
+    params = list(parent_params)
+    # Layout: mu, omega, alpha[1..p], gamma[1..o], beta[1..q], distribution parameters
+    if p > parent_p:
+        params.insert(2 + parent_p, 0.0)
+    else:
+        params.insert(2 + p + o + parent_q, 0.0)
+    return np.asarray(params)
+
+
+def _fit_spec(returns, spec, starting_values=None, parent_loglikelihood=None):
+    model = build_model(returns, spec)
+    result = model.fit(disp='off', starting_values=starting_values)
+    if starting_values is not None and (result.convergence_flag != 0 or result.loglikelihood <= parent_loglikelihood + LIKELIHOOD_TOLERANCE):
+        # The warm start stalled or ended in a worse optimum; try a cold start as well
+        cold = model.fit(disp='off')
+        if cold.loglikelihood > result.loglikelihood:
+            result = cold
+    return {
+        'spec': spec,
+        'aic': result.aic,
+        'loglikelihood': result.loglikelihood,
+        'params': result.params.to_numpy(),
+    }
+
+
+def _parent(fitted, spec):
+    model, p, q, dist = spec
+    candidates = [fitted.get((model, p - 1, q, dist)), fitted.get((model, p, q - 1, dist))]
+    candidates = [candidate for candidate in candidates if candidate is not None]
+    return max(candidates, key=lambda candidate: candidate['loglikelihood']) if candidates else None
+
+
+def search_garch_orders(returns, specs, max_workers=None):
+    """Fit every specification.
+
+    Returns the results table sorted by AIC, the best specification and its fitted result.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if len(specs) < MIN_PARALLEL_SPECS:
+        max_workers = 1
+    waves = {}
+    for spec in specs:
+        waves.setdefault(spec[1] + spec[2], []).append(spec)
+
+    fitted = {}
+    executor = ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+    try:
+        for order in sorted(waves):
+            jobs = []
+            for spec in waves[order]:
+                parent = _parent(fitted, spec)
+                if parent:
+                    jobs.append((spec, nested_starting_values(parent['params'], parent['spec'], spec), parent['loglikelihood']))
+                else:
+                    jobs.append((spec, None, None))
+
+            if executor is None:
+                wave_results = [_fit_spec(returns, *job) for job in jobs]
+            else:
+                futures = [executor.submit(_fit_spec, returns, *job) for job in jobs]
+                wave_results = [future.result() for future in futures]
+
+            for result in wave_results:
+                fitted[result['spec']] = result
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    results_df = pd.DataFrame([
+        {'Model': spec_label(result['spec']), 'p': result['spec'][1], 'q': result['spec'][2],
+         'AIC': result['aic'], 'Log-likelihood': result['loglikelihood']}
+        for result in fitted.values()
+    ]).sort_values('AIC').reset_index(drop=True)
+
+    # Rebuild the winner at its fitted parameters to get the full result object; refitting
+    # from them can wander off to a far worse optimum
+    best = min(fitted.values(), key=lambda result: result['aic'])
+    best_fit = build_model(returns, best['spec']).fix(best['params'])
+    return results_df, best['spec'], best_fit
@@ -1,20 +1,35 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import yfinance as yf
+from data_store import fetch_data
 import plotly.graph_objects as go
-from itertools import product
-
-def calculate_hedge(nasdaq_value, nasdaq_leverage, nasdaq_inverse_leverage):
-    nasdaq_exposure = nasdaq_value * nasdaq_leverage
-    hedge_amount = nasdaq_exposure / abs(nasdaq_inverse_leverage)
-    return hedge_amount
-
-@st.cache_data
-def fetch_data(ticker, start, end):
-    data = yf.download(ticker, start=start, end=end)
-    data.reset_index(inplace=True)
-    return data
+from instrumentation import span
+from hedging_engine import evaluate_hedging_grid, hedging_curves
+from job_manager import get_manager, follow_job, replace_job, session_id
+from result_cache import cached_result
+
+def run_hedging_grid(start_date, end_date, nasdaq_value, total_amount_available, max_leverage_nasdaq, max_leverage_inverse, progress=None):
+    # Fetch NASDAQ data
+    nasdaq_data = fetch_data('^IXIC', start_date, end_date)
+
+    # Filter data starting from 23-Apr-2021
+    nasdaq_data = nasdaq_data[nasdaq_data['Date'] >= '2021-04-23']
+
+    # Define ranges for different leverages and hedge amounts based on risk profile
+    leverage_range_nasdaq = range(1, max_leverage_nasdaq + 1)
+    leverage_range_inverse = range(1, max_leverage_inverse + 1)
+    hedge_amount_range = np.linspace(0.5, 2.0, 16)  # 0.5x to 2.0x the calculated hedge amount
+
+    # Evaluate every affordable combination from precomputed leverage curves, in small chunks to report progress
+    # (or reuse the stored grid for this data)
+    params = {'start': start_date, 'nasdaq_value': nasdaq_value, 'total_amount_available': total_amount_available,
+              'max_leverage_nasdaq': max_leverage_nasdaq, 'max_leverage_inverse': max_leverage_inverse, 'hedge_amounts': hedge_amount_range}
+    results_df = cached_result('hedging_grid', params, nasdaq_data[['Date', 'Close']], lambda: {
+        'grid': evaluate_hedging_grid(nasdaq_data['Close'], nasdaq_value, total_amount_available,
+                                      leverage_range_nasdaq, leverage_range_inverse, hedge_amount_range,
+                                      chunk_size=256, progress=progress)
+    })['grid']
+    return nasdaq_data, results_df
 
 def show_hedging_strategy():
     st.title("Hedging Strategy Calculator")
@@ -29,38 +44,29 @@ def show_hedging_strategy():
     end_date = st.date_input("End date:", value=pd.to_datetime("today"))
 
     if st.button("Calculate Hedge Amount"):
-        # Fetch NASDAQ data
-        nasdaq_data = fetch_data('^IXIC', start_date, end_date)
-
-        # Filter data starting from 23-Apr-2021
-        nasdaq_data = nasdaq_data[nasdaq_data['Date'] >= '2021-04-23']
-
-        # Define ranges for different leverages and hedge amounts based on risk profile
-        leverage_range_nasdaq = range(1, max_leverage_nasdaq + 1)
-        leverage_range_inverse = range(1, max_leverage_inverse + 1)
-        hedge_amount_range = np.linspace(0.5, 2.0, 16)  # 0.5x to 2.0x the calculated hedge amount
-
-        results = []
-
-        for nasdaq_leverage, inverse_leverage, hedge_multiplier in product(leverage_range_nasdaq, leverage_range_inverse, hedge_amount_range):
-            hedge_amount = calculate_hedge(nasdaq_value, nasdaq_leverage, inverse_leverage) * hedge_multiplier
-            if (nasdaq_value + hedge_amount) > total_amount_available:
-                continue
-            nasdaq_data[f'NASDAQ x{nasdaq_leverage}'] = nasdaq_value * (nasdaq_data['Close'].pct_change().fillna(0) * nasdaq_leverage + 1).cumprod()
-            nasdaq_data[f'NASDAQ -x{inverse_leverage}'] = hedge_amount * (nasdaq_data['Close'].pct_change().fillna(0) * -inverse_leverage + 1).cumprod()
-            nasdaq_data['Total Portfolio Value'] = nasdaq_data[f'NASDAQ x{nasdaq_leverage}'] + nasdaq_data[f'NASDAQ -x{inverse_leverage}']
-
-            final_value = nasdaq_data['Total Portfolio Value'].iloc[-1]
-            max_drawdown = ((nasdaq_data['Total Portfolio Value'].cummax() - nasdaq_data['Total Portfolio Value']) / nasdaq_data['Total Portfolio Value'].cummax()).max()
-            results.append({
-                'nasdaq_leverage': nasdaq_leverage,
-                'inverse_leverage': inverse_leverage,
-                'hedge_multiplier': hedge_multiplier,
-                'final_value': final_value,
-                'max_drawdown': max_drawdown
-            })
-
-        results_df = pd.DataFrame(results)
+        # Run the grid search in the background so reruns don't interrupt it
+        job = get_manager().submit("Hedging grid search", run_hedging_grid, start_date, end_date, nasdaq_value,
+                                   total_amount_available, max_leverage_nasdaq, max_leverage_inverse, subscriber=session_id())
+        previous = st.session_state.get('hedging_job')
+        replace_job(previous['key'] if previous else None, job)
+        st.session_state['hedging_job'] = {'key': job.key, 'nasdaq_value': nasdaq_value, 'total_amount_available': total_amount_available}
+
+    submitted = st.session_state.get('hedging_job')
+    job = get_manager().get(submitted['key']) if submitted else None
+    if job is not None:
+        with span('compute', job.name):
+            job = follow_job(job, describe_partial=lambda best: f"x{best['nasdaq_leverage']} / -x{best['inverse_leverage']}, "
+                                                                f"hedge {best['hedge_multiplier']:.2f}: €{best['final_value']:.2f}")
+        if job is None:
+            del st.session_state['hedging_job']
+            st.info("Hedge calculation cancelled.")
+        elif job.status != 'done':
+            st.error(f"Hedge calculation {job.status}. {job.error or ''}")
+
+    if job is not None and job.status == 'done':
+        # Show the results of the submitted parameters, even if the inputs changed since
+        nasdaq_data, results_df = job.result
+        nasdaq_value, total_amount_available = submitted['nasdaq_value'], submitted['total_amount_available']
         optimal_strategy = results_df.loc[results_df['final_value'].idxmax()]
 
         st.subheader("Optimal Strategy")
@@ -73,11 +79,14 @@ def show_hedging_strategy():
         # Recalculate the optimal strategy
         optimal_nasdaq_leverage = optimal_strategy['nasdaq_leverage']
         optimal_inverse_leverage = optimal_strategy['inverse_leverage']
-        optimal_hedge_amount = calculate_hedge(nasdaq_value, optimal_nasdaq_leverage, optimal_inverse_leverage) * optimal_strategy['hedge_multiplier']
+        with span('compute', 'optimal curves'):
+            long_value, inverse_value, total_value = hedging_curves(nasdaq_data['Close'], nasdaq_value, optimal_nasdaq_leverage,
+                                                                    optimal_inverse_leverage, optimal_strategy['hedge_multiplier'])
 
-        nasdaq_data[f'NASDAQ x{optimal_nasdaq_leverage}'] = nasdaq_value * (nasdaq_data['Close'].pct_change().fillna(0) * optimal_nasdaq_leverage + 1).cumprod()
-        nasdaq_data[f'NASDAQ -x{optimal_inverse_leverage}'] = optimal_hedge_amount * (nasdaq_data['Close'].pct_change().fillna(0) * -optimal_inverse_leverage + 1).cumprod()
-        nasdaq_data['Total Portfolio Value'] = nasdaq_data[f'NASDAQ x{optimal_nasdaq_leverage}'] + nasdaq_data[f'NASDAQ -x{optimal_inverse_leverage}']
+        nasdaq_data = nasdaq_data.copy()
+        nasdaq_data[f'NASDAQ x{optimal_nasdaq_leverage}'] = long_value
+        nasdaq_data[f'NASDAQ -x{optimal_inverse_leverage}'] = inverse_value
+        nasdaq_data['Total Portfolio Value'] = total_value
 
         # Create the plot
         fig = go.Figure()
@@ -96,7 +105,8 @@ def show_hedging_strategy():
             plot_bgcolor='rgba(0,0,0,0)'
         )
 
-        st.plotly_chart(fig, use_container_width=True)
+        with span('render', 'investment comparison chart'):
+            st.plotly_chart(fig, use_container_width=True)
 
         # Add personalized explanation
         st.write(f"""
@@ -0,0 +1,89 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Array-based engine behind the hedging grid search in hedging.py.
+#
+# The value of a leveraged ETF position only depends on its own leverage, and the hedge
+# multiplier only scales the size of the inverse position. So each leverage curve is
+# computed once, and every (NASDAQ leverage, inverse leverage, hedge multiplier)
+# portfolio is a weighted sum of two precomputed curves, evaluated in chunks of
+# combinations at a time.
+
+
+def calculate_hedge(nasdaq_value, nasdaq_leverage, nasdaq_inverse_leverage):
+    nasdaq_exposure = nasdaq_value * nasdaq_leverage
+    hedge_amount = nasdaq_exposure / abs(nasdaq_inverse_leverage)
+    return hedge_amount
+
+
+def leverage_curves(close, leverages):
+    """Growth of one unit invested at each leverage (rows) over time (columns)."""
+    daily_returns = pd.Series(close).pct_change().fillna(0).to_numpy(dtype=float)
+    return np.cumprod(1 + np.outer(np.asarray(leverages, dtype=float), daily_returns), axis=1)
+
+
+def max_drawdowns(values):
+    """Maximum drawdown of every row of `values`."""
+    peaks = np.maximum.accumulate(values, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmax((peaks - values) / peaks, axis=1)
+
+
+def evaluate_hedging_grid(close, nasdaq_value, total_amount_available, leverage_range_nasdaq, leverage_range_inverse, hedge_amount_range, chunk_size=4096, progress=None):
+    """Final value and max drawdown of every affordable hedging combination.
+
+    Returns one row per combination, in the same order and with the same columns as
+    the original nested loop in hedging.py. `progress(fraction, best)` is called after
+    every chunk with the best combination found so far.
+    """
+    nasdaq_leverages = np.asarray(list(leverage_range_nasdaq))
+    inverse_leverages = np.asarray(list(leverage_range_inverse))
+    hedge_multipliers = np.asarray(list(hedge_amount_range), dtype=float)
+
+    long_curves = nasdaq_value * leverage_curves(close, nasdaq_leverages)
+    inverse_curves = leverage_curves(close, -inverse_leverages)
+
+    # (nasdaq leverage, inverse leverage, hedge multiplier) grid, flattened in loop order
+    long_index, inverse_index, multiplier_index = (index.ravel() for index in np.meshgrid(
+        np.arange(len(nasdaq_leverages)), np.arange(len(inverse_leverages)), np.arange(len(hedge_multipliers)), indexing='ij'))
+    hedge_amounts = calculate_hedge(nasdaq_value, nasdaq_leverages[long_index], inverse_leverages[inverse_index]) * hedge_multipliers[multiplier_index]
+
+    affordable = (nasdaq_value + hedge_amounts) <= total_amount_available
+    long_index, inverse_index, multiplier_index = long_index[affordable], inverse_index[affordable], multiplier_index[affordable]
+    hedge_amounts = hedge_amounts[affordable]
+
+    final_values = np.empty(len(hedge_amounts))
+    drawdowns = np.empty(len(hedge_amounts))
+    for start in range(0, len(hedge_amounts), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        totals = long_curves[long_index[chunk]] + hedge_amounts[chunk, None] * inverse_curves[inverse_index[chunk]]
+        final_values[chunk] = totals[:, -1]
+        drawdowns[chunk] = max_drawdowns(totals)
+        if progress is not None:
+            stop = min(start + chunk_size, len(hedge_amounts))
+            best = np.argmax(final_values[:stop])
+            progress(stop / len(hedge_amounts), {
+                'nasdaq_leverage': nasdaq_leverages[long_index[best]],
+                'inverse_leverage': inverse_leverages[inverse_index[best]],
+                'hedge_multiplier': hedge_multipliers[multiplier_index[best]],
+                'final_value': final_values[best],
+            })
+
+    return pd.DataFrame({
+        'nasdaq_leverage': nasdaq_leverages[long_index],
+        'inverse_leverage': inverse_leverages[inverse_index],
+        'hedge_multiplier': hedge_multipliers[multiplier_index],
+        'final_value': final_values,
+        'max_drawdown': drawdowns
+    })
+
+
+def hedging_curves(close, nasdaq_value, nasdaq_leverage, inverse_leverage, hedge_multiplier):
+    """Value of the leveraged position, the inverse position and their total over time."""
+    hedge_amount = calculate_hedge(nasdaq_value, nasdaq_leverage, inverse_leverage) * hedge_multiplier
+    long_value = nasdaq_value * leverage_curves(close, [nasdaq_leverage])[0]
+    inverse_value = hedge_amount * leverage_curves(close, [-inverse_leverage])[0]
+    return long_value, inverse_value, long_value + inverse_value
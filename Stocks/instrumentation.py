@@ -0,0 +1,156 @@
+import cProfile
+import importlib.util
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Per-run timing instrumentation for the dashboard pages.
+#
+# A page rerun is wrapped in `page_run`, and inside it the page marks its stages with
+# `span('fetch' | 'compute' | 'render', name)`. The caches report hits and misses with
+# `count`. Outside a page run (batch jobs, benchmarks, worker threads) both are no-ops,
+# so the engines can be instrumented without caring who calls them. A finished run is
+# a plain dict, shown in the sidebar panel and, when STOCKS_INSTRUMENTATION_LOG is
+# set, appended to that file as one JSON line. A single rerun can also be profiled
+# with cProfile or, when installed, pyinstrument.
+
+LOG_PATH = os.environ.get("STOCKS_INSTRUMENTATION_LOG")
+STAGES = ('fetch', 'compute', 'render')
+MAX_RUNS_KEPT = 50
+
+_local = threading.local()
+
+
+def current_run():
+    return getattr(_local, 'run', None)
+
+
+@contextmanager
+def span(stage, name=None):
+    """Time the enclosed block as one `stage` of the current page run."""
+    run = current_run()
+    if run is None:
+        yield
+        return
+    start = time.perf_counter()
+    record = {'stage': stage, 'name': name or stage, 'depth': len(run['_stack']), 'offset': start - run['_start']}
+    run['_stack'].append(record)
+    try:
+        yield
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        run['_stack'].pop()
+        run['spans'].append(record)
+
+
+def count(cache, hit, n=1):
+    """Record `n` hits (or misses) of `cache` in the current page run."""
+    run = current_run()
+    if run is None:
+        return
+    counters = run['caches'].setdefault(cache, {'hits': 0, 'misses': 0})
+    counters['hits' if hit else 'misses'] += n
+
+
+def available_profilers():
+    profilers = ['cProfile']
+    if importlib.util.find_spec('pyinstrument') is not None:
+        profilers.append('pyinstrument')
+    return profilers
+
+
+def _start_profiler(kind):
+    if kind == 'pyinstrument':
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def _stop_profiler(kind, profiler, limit=40):
+    if kind == 'pyinstrument':
+        profiler.stop()
+        return profiler.output_text(unicode=True)
+    profiler.disable()
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(limit)
+    return output.getvalue()
+
+
+def stage_totals(run):
+    """Seconds per stage, counting only outermost spans, plus the unaccounted rest."""
+    totals = dict.fromkeys(STAGES, 0.0)
+    for record in run['spans']:
+        if record['depth'] == 0:
+            totals[record['stage']] = totals.get(record['stage'], 0.0) + record['seconds']
+    totals['other'] = max(run['seconds'] - sum(totals.values()), 0.0)
+    return totals
+
+
+def write_log(run, path=LOG_PATH):
+    with open(path, 'a') as f:
+        f.write(json.dumps({key: value for key, value in run.items() if key != 'profile'}) + '\n')
+
+
+@contextmanager
+def page_run(page, profiler=None):
+    """Collect the spans and cache counters of one rerun of `page`; yields the run dict."""
+    run = {
+        'page': page,
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'spans': [],
+        'caches': {},
+        'profiler': profiler,
+        'profile': None,
+        '_stack': [],
+        '_start': time.perf_counter(),
+    }
+    _local.run = run
+    active_profiler = _start_profiler(profiler) if profiler else None
+    try:
+        yield run
+    finally:
+        if active_profiler is not None:
+            run['profile'] = _stop_profiler(profiler, active_profiler)
+        run['seconds'] = time.perf_counter() - run.pop('_start')
+        del run['_stack']
+        run['spans'].sort(key=lambda record: record['offset'])
+        run['stages'] = stage_totals(run)
+        _local.run = None
+        if LOG_PATH:
+            write_log(run)
+
+
+def profile_request(container):
+    """Profiler controls; returns the profiler to use when this rerun was requested from the button."""
+    kind = container.selectbox("Profiler", available_profilers())
+    return kind if container.button("Profile one rerun") else None
+
+
+def show_run_report(container, runs):
+    """Timing breakdown of the latest run, its cache counters and profile, and the log export."""
+    if not runs:
+        return
+    run = runs[-1]
+    container.write(f"**{run['page']}**: {run['seconds']:.2f} s")
+    container.table([{'Stage': stage, 'Seconds': round(seconds, 3)} for stage, seconds in run['stages'].items()])
+    if run['spans']:
+        container.table([
+            {'Span': '  ' * record['depth'] + record['name'], 'Stage': record['stage'], 'Seconds': round(record['seconds'], 3)}
+            for record in run['spans']
+        ])
+    if run['caches']:
+        container.table([{'Cache': cache, **counters} for cache, counters in run['caches'].items()])
+    if run['profile']:
+        container.text(f"{run['profiler']} profile")
+        container.code(run['profile'])
+    container.download_button("Download timing log (JSON)", json.dumps(runs, indent=2),
+                               file_name="instrumentation.json", mime="application/json")
@@ -1,9 +1,13 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import yfinance as yf
+from data_store import fetch_data
 import plotly.graph_objects as go
-from itertools import product
+from instrumentation import span
+from strategy_engine import prepare_strategy_data, sweep_investment, adaptive_search, top_trajectories
+from job_manager import get_manager, follow_job, replace_job, session_id
+from result_cache import cached_result
+from walk_forward import walk_forward
 
 # Custom CSS for styling
 st.markdown(
@@ -26,6 +30,146 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+def run_strategy_sweeps(ticker_list, start_date, end_date, leverage_factor, threshold_values, monthly_addition_values, initial_investment,
+                        optimizer='grid', search_leverage=False, top_k=5, progress=None):
+    """Sweep every ticker; returns the result surface, the adaptive search summaries and the top-K trajectories per ticker."""
+    results = []
+    search_summaries = []
+    trajectories = {}
+    for k, ticker in enumerate(ticker_list):
+        nasdaq_data = fetch_data(ticker, start_date, end_date)
+        nasdaq_data = prepare_strategy_data(nasdaq_data, leverage_factor)
+
+        def ticker_progress(fraction, best):
+            if progress is not None:
+                progress((k + fraction) / len(ticker_list), {'Ticker': ticker, 'Leverage': leverage_factor, **best})
+
+        if optimizer == 'adaptive':
+            # Coarse pass over threshold (and leverage), then refine around the best cells
+            leverage_range = (1, leverage_factor) if search_leverage else (leverage_factor, leverage_factor)
+            params = {'ticker': ticker, 'start': start_date, 'leverage_range': leverage_range, 'monthly_additions': monthly_addition_values,
+                      'initial_investment': initial_investment, 'top_k': top_k}
+
+            def search():
+                table, summary = adaptive_search(nasdaq_data, leverage_range, (-0.10, 0.0), monthly_addition_values, initial_investment,
+                                                 progress=ticker_progress)
+                return {'table': table, 'summary': summary, **top_trajectories(nasdaq_data, table, initial_investment, top_k)}
+
+            parts = cached_result('strategy_adaptive_surface', params, nasdaq_data[['Date', 'Close']], search)
+            table = parts['table']
+            search_summaries.append({'Ticker': ticker, **parts['summary']})
+        else:
+            # Evaluate the whole threshold x monthly addition grid in one pass (or reuse the stored grid for this data)
+            params = {'ticker': ticker, 'start': start_date, 'leverage_factor': leverage_factor, 'thresholds': threshold_values,
+                      'monthly_additions': monthly_addition_values, 'initial_investment': initial_investment, 'top_k': top_k}
+
+            def sweep():
+                final_values = sweep_investment(threshold_values, monthly_addition_values, initial_investment, nasdaq_data,
+                                                progress=ticker_progress)
+                return {'final_values': final_values,
+                        **top_trajectories(nasdaq_data, grid_table(threshold_values, leverage_factor, monthly_addition_values, final_values),
+                                           initial_investment, top_k)}
+
+            parts = cached_result('strategy_surface', params, nasdaq_data[['Date', 'Close']], sweep)
+            table = grid_table(threshold_values, leverage_factor, monthly_addition_values, parts['final_values'])
+
+        table.insert(0, 'Ticker', ticker)
+        results.append(table)
+        trajectories[ticker] = {name: parts[name] for name in ('configurations', 'dates', 'close', 'investment_values', 'wallet_values', 'buys')}
+    return pd.concat(results, ignore_index=True), search_summaries, trajectories
+
+def grid_table(threshold_values, leverage_factor, monthly_addition_values, final_values):
+    thresholds, monthly_additions = (grid.ravel() for grid in np.meshgrid(threshold_values, monthly_addition_values, indexing='ij'))
+    return pd.DataFrame({
+        'Threshold': thresholds,
+        'Leverage': leverage_factor,
+        'Monthly Addition': monthly_additions,
+        'Final Value': final_values.ravel()
+    })
+
+def run_walk_forward(ticker_list, start_date, end_date, leverage_factor, threshold_values, monthly_addition_values, initial_investment,
+                     train_months, test_months, progress=None):
+    reports = {}
+    for k, ticker in enumerate(ticker_list):
+        nasdaq_data = fetch_data(ticker, start_date, end_date)
+
+        def ticker_progress(fraction, summary):
+            if progress is not None:
+                progress((k + fraction) / len(ticker_list), {'Ticker': ticker, **summary})
+
+        reports[ticker] = walk_forward(nasdaq_data, leverage_factor, threshold_values, monthly_addition_values, initial_investment,
+                                       train_months, test_months, progress=ticker_progress)
+    return reports
+
+def plot_strategy(ticker, paths):
+    """Chart of the best kept trajectory, with the runner-up configurations as thin lines."""
+    best = paths['configurations'].iloc[0]
+    dates = paths['dates']
+    buys = paths['buys'][0]
+    # The wallet is emptied into the position on a buy day, so the value after the buy is their sum
+    buy_amounts = paths['investment_values'][0][buys] + paths['wallet_values'][0][buys]
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(x=dates, y=paths['investment_values'][0], mode='lines', name='Investment Value'))
+    for k, row in paths['configurations'].iloc[1:].iterrows():
+        fig.add_trace(go.Scatter(x=dates, y=paths['investment_values'][k], mode='lines', line=dict(width=1), opacity=0.5,
+                                 name=f"#{k + 1}: threshold {row['Threshold']:.2%}, {int(row['Leverage'])}x, addition {row['Monthly Addition']:.0f}"))
+    fig.add_trace(go.Scatter(x=dates, y=paths['close'], mode='lines', name='NASDAQ Index Value', line=dict(dash='dash')))
+    fig.add_trace(go.Scatter(x=dates[buys], y=buy_amounts, mode='markers', name='Buy Points', marker=dict(size=10, color='red')))
+
+    # Add wallet values as a bar chart on the right axis
+    fig.add_trace(go.Bar(x=dates, y=paths['wallet_values'][0], name='Wallet Value', yaxis='y2', opacity=0.5))
+
+    fig.update_layout(
+        title=f'Optimal Investment Strategy for {ticker} in Leveraged NASDAQ ETF ({int(best["Leverage"])}x)',
+        xaxis_title='Date',
+        yaxis_title='Investment Value (€)',
+        yaxis2=dict(
+            title='Wallet Value (€)',
+            overlaying='y',
+            side='right'
+        ),
+        template='plotly_white',
+        width=1200,
+        height=800,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)'
+    )
+    return fig
+
+def plot_surface(ticker, results_df):
+    """Heatmap of the final value over threshold x monthly addition (best leverage per cell)."""
+    surface = results_df.pivot_table(index='Monthly Addition', columns='Threshold', values='Final Value', aggfunc='max')
+    fig = go.Figure(go.Heatmap(x=surface.columns, y=surface.index, z=surface.values, colorscale='Viridis',
+                               colorbar=dict(title='Final Value (€)')))
+    fig.update_layout(
+        title=f'Final Value by Threshold and Monthly Addition for {ticker}',
+        xaxis_title='Threshold',
+        yaxis_title='Monthly Addition (€)',
+        xaxis_tickformat='.1%',
+        template='plotly_white',
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)'
+    )
+    return fig
+
+def plot_walk_forward(ticker, folds_df):
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=folds_df['Test Start'], y=folds_df['In-sample Return'], name='In-sample return (train window)'))
+    fig.add_trace(go.Bar(x=folds_df['Test Start'], y=folds_df['Out-of-sample Return'], name='Out-of-sample return (next test window)'))
+    fig.update_layout(
+        title=f'Walk-forward Evaluation for {ticker}',
+        xaxis_title='Test window start',
+        yaxis_title='Annualized money-weighted return',
+        yaxis_tickformat='.0%',
+        barmode='group',
+        template='plotly_white',
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)'
+    )
+    return fig
+
 def show_investment_strategy():
     st.title("Investment Strategy")
 
@@ -44,82 +188,71 @@ def show_investment_strategy():
         st.subheader("Investment Parameters")
         initial_investment = st.number_input("Initial investment:", value=10000)
         max_monthly_addition = st.number_input("Maximum monthly addition:", value=1000)
+
+        st.subheader("Optimizer")
+        optimizer = st.radio("Search method:", ["Grid search", "Adaptive search"],
+                             help="Adaptive search runs a coarse pass and refines around the best thresholds, down to a 16x finer step.")
+        search_leverage = st.checkbox("Also search the leverage (1x up to the leverage factor, adaptive search only)", value=False)
+
+        st.subheader("Out-of-sample Evaluation")
+        run_walk_forward_evaluation = st.checkbox("Walk-forward evaluation (sweep each train window, score the next test window)", value=False)
+        col1, col2 = st.columns(2)
+        with col1:
+            train_months = st.number_input("Train window (months):", min_value=1, value=12)
+        with col2:
+            test_months = st.number_input("Test window (months):", min_value=1, value=3)
         submit_button = st.form_submit_button("Run Simulation")
 
     if submit_button:
-        @st.cache_data
-        def fetch_data(ticker, start, end):
-            data = yf.download(ticker, start=start, end=end)
-            data.reset_index(inplace=True)
-            return data
-
-        def simulate_investment(threshold, initial_investment, monthly_addition, nasdaq_data):
-            wallet = 0
-            cumulative_value = initial_investment
-            investment_values = []
-            wallet_values = []
-            buy_dates = []
-            buy_amounts = []
-
-            for i, row in nasdaq_data.iterrows():
-                if row['Date'].day == 10:
-                    wallet += monthly_addition
-
-                daily_return = np.exp(row['Leveraged Log Returns'])
-                cumulative_value *= daily_return
-                investment_values.append(cumulative_value)
-                wallet_values.append(wallet)
-
-                if row['Log Returns'] <= threshold and wallet > 0:
-                    cumulative_value += wallet
-                    buy_dates.append(row['Date'])
-                    buy_amounts.append(cumulative_value)
-                    wallet = 0
-
-            return cumulative_value, investment_values, wallet_values, buy_dates, buy_amounts
-
         # Parameter sweep settings
         threshold_values = np.arange(-0.10, 0.0, 0.01)  # More granular threshold values from -10% to 0%
         monthly_addition_values = np.arange(100, max_monthly_addition + 100, 100)  # Monthly additions from 100 to max_monthly_addition in increments of 100
 
-        results = []
-
+        # Run the sweeps in the background so reruns don't interrupt them
         ticker_list = [ticker.strip() for ticker in tickers.split(",")]
-        for ticker in ticker_list:
-            nasdaq_data = fetch_data(ticker, start_date, end_date)
-
-            nasdaq_data['Log Returns'] = np.log(nasdaq_data['Close'] / nasdaq_data['Close'].shift(1))
-            nasdaq_data.dropna(inplace=True)
-            nasdaq_data['Leveraged Log Returns'] = nasdaq_data['Log Returns'] * leverage_factor
-
-            for threshold, monthly_addition in product(threshold_values, monthly_addition_values):
-                final_value, _, _, _, _ = simulate_investment(threshold, initial_investment, monthly_addition, nasdaq_data)
-                results.append({
-                    'Ticker': ticker,
-                    'Threshold': threshold,
-                    'Monthly Addition': monthly_addition,
-                    'Final Value': final_value
-                })
-
-        results_df = pd.DataFrame(results)
+        job = get_manager().submit("Strategy sweep", run_strategy_sweeps, ticker_list, start_date, end_date, leverage_factor,
+                                   threshold_values, monthly_addition_values, initial_investment,
+                                   optimizer='adaptive' if optimizer == "Adaptive search" else 'grid', search_leverage=search_leverage,
+                                   subscriber=session_id())
+        replace_job(st.session_state.get('strategy_job'), job)
+        st.session_state['strategy_job'] = job.key
+
+        job = None
+        if run_walk_forward_evaluation:
+            job = get_manager().submit("Walk-forward evaluation", run_walk_forward, ticker_list, start_date, end_date, leverage_factor,
+                                       threshold_values, monthly_addition_values, initial_investment, train_months, test_months,
+                                       subscriber=session_id())
+        replace_job(st.session_state.pop('walk_forward_job', None), job)
+        if job is not None:
+            st.session_state['walk_forward_job'] = job.key
+
+    job = get_manager().get(st.session_state.get('strategy_job'))
+    if job is not None:
+        with span('compute', job.name):
+            job = follow_job(job, describe_partial=lambda best: f"{best['Ticker']} threshold {best['Threshold']:.2%}, leverage {best['Leverage']}x, "
+                                                                f"addition {best['Monthly Addition']:.0f}: {best['Final Value']:.2f}")
+        if job is None:
+            del st.session_state['strategy_job']
+            st.info("Simulation cancelled.")
+        elif job.status != 'done':
+            st.error(f"Simulation {job.status}. {job.error or ''}")
+
+    if job is not None and job.status == 'done':
+        results_df, search_summaries, trajectories = job.result
         optimal_strategies = results_df.loc[results_df.groupby('Ticker')['Final Value'].idxmax()]
 
         st.subheader("Optimal Strategies for Each Stock")
         st.dataframe(optimal_strategies)
+        if search_summaries:
+            st.caption("Adaptive search: configurations evaluated vs. the full grid at the same final resolution")
+            st.dataframe(pd.DataFrame(search_summaries).rename(columns={
+                'evaluations': 'Evaluations', 'full_grid_evaluations': 'Full grid', 'threshold_resolution': 'Threshold step'}))
 
         for _, row in optimal_strategies.iterrows():
             ticker = row['Ticker']
-            optimal_threshold = row['Threshold']
-            optimal_monthly_addition = row['Monthly Addition']
+            paths = trajectories[ticker]
             ending_value = row['Final Value']
 
-            nasdaq_data = fetch_data(ticker, start_date, end_date)
-            nasdaq_data['Log Returns'] = np.log(nasdaq_data['Close'] / nasdaq_data['Close'].shift(1))
-            nasdaq_data.dropna(inplace=True)
-            nasdaq_data['Leveraged Log Returns'] = nasdaq_data['Log Returns'] * leverage_factor
-
-            _, investment_values, wallet_values, buy_dates, buy_amounts = simulate_investment(optimal_threshold, initial_investment, optimal_monthly_addition, nasdaq_data)
-
             # Calculate CAGR
             num_years = (end_date - start_date).days / 365.25
             cagr = ((ending_value / initial_investment) ** (1 / num_years)) - 1
@@ -127,32 +260,34 @@ def show_investment_strategy():
             st.subheader(f"CAGR for {ticker}")
             st.write(f"Compound Annual Growth Rate (CAGR): {cagr:.2%}")
 
-            fig = go.Figure()
-
-            fig.add_trace(go.Scatter(x=nasdaq_data['Date'], y=investment_values, mode='lines', name='Investment Value'))
-            fig.add_trace(go.Scatter(x=nasdaq_data['Date'], y=nasdaq_data['Close'], mode='lines', name='NASDAQ Index Value', line=dict(dash='dash')))
-            fig.add_trace(go.Scatter(x=buy_dates, y=buy_amounts, mode='markers', name='Buy Points', marker=dict(size=10, color='red')))
-
-            # Add wallet values as a bar chart on the right axis
-            fig.add_trace(go.Bar(x=nasdaq_data['Date'], y=wallet_values, name='Wallet Value', yaxis='y2', opacity=0.5))
-
-            fig.update_layout(
-                title=f'Optimal Investment Strategy for {ticker} in Leveraged NASDAQ ETF ({leverage_factor}x)',
-                xaxis_title='Date',
-                yaxis_title='Investment Value (€)',
-                yaxis2=dict(
-                    title='Wallet Value (€)',
-                    overlaying='y',
-                    side='right'
-                ),
-                template='plotly_white',
-                width=1200,
-                height=800,
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)'
-            )
-
-            st.plotly_chart(fig, use_container_width=True)
+            with span('render', f'strategy chart {ticker}'):
+                st.plotly_chart(plot_strategy(ticker, paths), use_container_width=True)
+            with span('render', f'surface heatmap {ticker}'):
+                st.plotly_chart(plot_surface(ticker, results_df[results_df['Ticker'] == ticker]), use_container_width=True)
+
+    job = get_manager().get(st.session_state.get('walk_forward_job'))
+    if job is not None:
+        with span('compute', job.name):
+            job = follow_job(job, describe_partial=lambda summary: f"{summary['Ticker']} median out-of-sample return "
+                                                                   f"{summary['median_out_of_sample_return']:.2%} over {summary['folds']} folds")
+        if job is None:
+            del st.session_state['walk_forward_job']
+            st.info("Walk-forward evaluation cancelled.")
+        elif job.status != 'done':
+            st.error(f"Walk-forward evaluation {job.status}. {job.error or ''}")
+
+    if job is not None and job.status == 'done':
+        st.subheader("Walk-forward Evaluation")
+        for ticker, (folds_df, summary) in job.result.items():
+            st.write(f"""
+            **{ticker}**: over {summary['folds']} folds, the median in-sample return is {summary['median_in_sample_return']:.2%}
+            and the median out-of-sample return is {summary['median_out_of_sample_return']:.2%}
+            ({summary['positive_out_of_sample_folds']} of {summary['folds']} test windows ended with a gain).
+            Returns are annualized money-weighted returns of the initial investment and the monthly additions.
+            """)
+            st.dataframe(folds_df)
+            with span('render', f'walk-forward chart {ticker}'):
+                st.plotly_chart(plot_walk_forward(ticker, folds_df), use_container_width=True)
 
 if __name__ == "__main__":
     show_investment_strategy()
\ No newline at end of file
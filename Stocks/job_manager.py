@@ -0,0 +1,201 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Background execution of long computations for the dashboard pages.
+#
+# A page submits its sweep to the process-wide `JobManager` instead of running it in
+# the script thread, remembers the job key in its session state and follows the job on
+# every rerun, so a widget change no longer throws the work away. The job function
+# gets a `progress(fraction, partial=None)` callback to report how far it is and the
+# best result so far; the callback raises `JobCancelled` once the job was cancelled.
+# Jobs are keyed by a hash of their inputs: submitting the same inputs while a job is
+# running (from any session) attaches to it instead of starting a second computation.
+# The sessions attached to a job are its subscribers, each counted once however often
+# it resubmits; the job is cancelled when all of them cancel. A finished job is never
+# handed out again, the result cache of the job function takes care of reusing results.
+
+MAX_WORKERS = 2
+MAX_FINISHED_JOBS = 20
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _hash_value(digest, value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(pd.util.hash_pandas_object(value).values.tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(str((value.dtype, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'[')
+        for item in value:
+            _hash_value(digest, item)
+        digest.update(b']')
+    elif isinstance(value, dict):
+        _hash_value(digest, sorted(value.items(), key=lambda item: str(item[0])))
+    else:
+        digest.update(json.dumps(value, default=str).encode())
+
+
+def input_hash(*values):
+    """Content hash of job inputs (frames, arrays, containers and JSON-like values)."""
+    digest = hashlib.sha256()
+    for value in values:
+        _hash_value(digest, value)
+    return digest.hexdigest()
+
+
+class Job:
+    def __init__(self, key, name):
+        self.key = key
+        self.name = name
+        self.status = 'running'
+        self.progress = 0.0
+        self.partial = None
+        self.result = None
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+        self.subscribers = set()
+        self._cancel = threading.Event()
+
+    def report(self, fraction, partial=None):
+        """Progress callback handed to the job function."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.progress = min(max(float(fraction), 0.0), 1.0)
+        if partial is not None:
+            self.partial = partial
+
+    def done(self):
+        return self.status != 'running'
+
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+
+
+class JobManager:
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name, function, *args, subscriber=None, **kwargs):
+        """Run `function(*args, progress=..., **kwargs)` in the background, or join the identical running job.
+
+        `subscriber` identifies the submitting session (see `session_id`).
+        """
+        key = input_hash(name, args, kwargs)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status == 'running':
+                job.subscribers.add(subscriber)
+                return job
+            job = Job(key, name)
+            job.subscribers.add(subscriber)
+            self._jobs[key] = job
+            self._forget_finished()
+        self._executor.submit(self._run, job, function, args, kwargs)
+        return job
+
+    def _run(self, job, function, args, kwargs):
+        try:
+            job.result = function(*args, progress=job.report, **kwargs)
+            job.progress = 1.0
+            job.status = 'done'
+        except JobCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = 'failed'
+        job.finished = time.time()
+
+    def _forget_finished(self):
+        finished = sorted((job for job in self._jobs.values() if job.done()), key=lambda job: job.finished)
+        for job in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[job.key]
+
+    def get(self, key):
+        return self._jobs.get(key)
+
+    def cancel(self, key, subscriber=None):
+        """Drop `subscriber` from the job; the computation stops when nobody else is waiting for it."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job.done():
+                return
+            job.subscribers.discard(subscriber)
+            if not job.subscribers:
+                job._cancel.set()
+
+    def jobs(self):
+        return list(self._jobs.values())
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    """The job manager shared by every session of this process."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
+
+
+def session_id():
+    """Identifier of the current Streamlit session, to subscribe to and cancel jobs with."""
+    import streamlit as st
+
+    if 'job_session_id' not in st.session_state:
+        st.session_state['job_session_id'] = uuid.uuid4().hex
+    return st.session_state['job_session_id']
+
+
+def replace_job(previous_key, job=None):
+    """Stop following the job `previous_key` from this session when it is not `job`.
+
+    The job is cancelled if no other session follows it, so a resubmission with new
+    inputs does not leave the old computation running for nobody.
+    """
+    if previous_key is not None and (job is None or job.key != previous_key):
+        get_manager().cancel(previous_key, session_id())
+
+
+def follow_job(job, describe_partial=None, poll_interval=0.5):
+    """Show the progress of `job` on the page until it finishes, with a button to cancel it.
+
+    Returns the finished job, or None when it was cancelled from this page. A rerun
+    triggered while waiting only stops the polling; the job keeps running and the
+    next rerun follows it again.
+    """
+    import streamlit as st
+
+    if job.done():
+        return job
+    if st.button("Cancel", key=f"cancel_{job.key}"):
+        get_manager().cancel(job.key, session_id())
+        return None
+    progress_bar = st.progress(0)
+    status = st.empty()
+    while not job.done():
+        progress_bar.progress(job.progress)
+        text = f"{job.name}: {job.progress:.0%} after {job.elapsed():.1f} s"
+        if job.partial is not None and describe_partial is not None:
+            text += f" | best so far: {describe_partial(job.partial)}"
+        status.text(text)
+        time.sleep(poll_interval)
+    progress_bar.empty()
+    status.empty()
+    return job
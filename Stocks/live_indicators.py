@@ -0,0 +1,264 @@
+import json
+import math
+import os
+import tempfile
+
+from decision_engine import INDICATORS, RISK_WEIGHTS, normalize_value
+
+# Incremental versions of the Investment Decision indicators, for refreshing a
+# watchlist bar by bar.
+#
+# Each indicator keeps a compact state and takes one new close per `update` call in
+# constant time: moving averages use a ring buffer with a running total, the RSI a
+# ring buffer of gains and losses (or Wilder's smoothing), and the return statistics
+# behind volatility and the Sharpe ratio Welford's running mean and variance. After
+# the same closes, the values equal what `show_investment_decision` and
+# `decision_engine.score_history` compute from the full history. Every state converts
+# to and from a plain dict, so a watchlist can be saved as JSON and resumed after a
+# restart.
+
+STATE_PATH = os.environ.get("STOCKS_LIVE_STATE", os.path.join(os.path.expanduser("~"), ".stockpredictions", "live_indicators.json"))
+
+
+class RollingMean:
+    """Mean of the last `window` values (NaN until there are `window` of them)."""
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = [0.0] * window
+        self.position = 0
+        self.count = 0
+        self.total = 0.0
+
+    def update(self, value):
+        if self.count == self.window:
+            self.total -= self.buffer[self.position]
+        else:
+            self.count += 1
+        self.buffer[self.position] = value
+        self.total += value
+        self.position = (self.position + 1) % self.window
+        if self.position == 0:
+            # Recompute the total once per lap so rounding errors do not accumulate
+            self.total = math.fsum(self.buffer)
+        return self.value
+
+    @property
+    def value(self):
+        return self.total / self.window if self.count == self.window else math.nan
+
+    def to_dict(self):
+        return {'window': self.window, 'buffer': self.buffer, 'position': self.position, 'count': self.count, 'total': self.total}
+
+    @classmethod
+    def from_dict(cls, state):
+        indicator = cls(state['window'])
+        indicator.buffer = list(state['buffer'])
+        indicator.position, indicator.count, indicator.total = state['position'], state['count'], state['total']
+        return indicator
+
+
+class RunningStats:
+    """Count, mean and sample variance of every value seen so far (Welford's algorithm)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2}
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls()
+        stats.count, stats.mean, stats.m2 = state['count'], state['mean'], state['m2']
+        return stats
+
+
+class RSI:
+    """Relative Strength Index of a close series.
+
+    `method='simple'` averages the last `window` gains and losses like `calculate_rsi`
+    (the first bar counts as no change). `method='wilder'` seeds with the simple
+    average of the first `window` changes and then smooths with weight 1 / `window`.
+    """
+
+    def __init__(self, window=14, method='simple'):
+        if method not in ('simple', 'wilder'):
+            raise ValueError(f"Unknown RSI method: {method}")
+        self.window = window
+        self.method = method
+        self.last_close = None
+        self.gains = RollingMean(window)
+        self.losses = RollingMean(window)
+        self.average_gain = math.nan
+        self.average_loss = math.nan
+
+    def update(self, close):
+        if self.last_close is None:
+            self.last_close = close
+            if self.method == 'simple':
+                self.gains.update(0.0)
+                self.losses.update(0.0)
+            return self.value
+        change = close - self.last_close
+        self.last_close = close
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        if self.method == 'wilder' and self.gains.count == self.window:
+            self.average_gain = (self.average_gain * (self.window - 1) + gain) / self.window
+            self.average_loss = (self.average_loss * (self.window - 1) + loss) / self.window
+        else:
+            self.average_gain = self.gains.update(gain)
+            self.average_loss = self.losses.update(loss)
+        return self.value
+
+    @property
+    def value(self):
+        if math.isnan(self.average_gain) or (self.average_gain == 0 and self.average_loss == 0):
+            return math.nan
+        if self.average_loss == 0:
+            return 100.0
+        return 100 - 100 / (1 + self.average_gain / self.average_loss)
+
+    def to_dict(self):
+        return {'window': self.window, 'method': self.method, 'last_close': self.last_close, 'gains': self.gains.to_dict(),
+                'losses': self.losses.to_dict(), 'average_gain': self.average_gain, 'average_loss': self.average_loss}
+
+    @classmethod
+    def from_dict(cls, state):
+        rsi = cls(state['window'], state['method'])
+        rsi.last_close = state['last_close']
+        rsi.gains, rsi.losses = RollingMean.from_dict(state['gains']), RollingMean.from_dict(state['losses'])
+        rsi.average_gain, rsi.average_loss = _from_json(state['average_gain'], math.nan), _from_json(state['average_loss'], math.nan)
+        return rsi
+
+
+class LiveIndicators:
+    """All indicators of the composite score for one ticker, updated one close at a time."""
+
+    def __init__(self, rsi_window=14, rsi_method='simple'):
+        self.last_close = None
+        self.max_price = -math.inf
+        self.prices = RunningStats()
+        self.returns = RunningStats()
+        self.moving_averages = {name: RollingMean(window) for name, window in (('ma10', 10), ('ma50', 50), ('ma200', 200))}
+        self.rsi = RSI(rsi_window, rsi_method)
+
+    @classmethod
+    def from_history(cls, closes, **kwargs):
+        """Seed the state from past closes (oldest first)."""
+        indicators = cls(**kwargs)
+        for close in closes:
+            indicators.update(close)
+        return indicators
+
+    def update(self, close):
+        close = float(close)
+        if self.last_close is not None:
+            self.returns.update(close / self.last_close - 1)
+        self.last_close = close
+        self.max_price = max(self.max_price, close)
+        self.prices.update(close)
+        for moving_average in self.moving_averages.values():
+            moving_average.update(close)
+        self.rsi.update(close)
+        return self.values()
+
+    def values(self):
+        """Raw indicator values, named as in `decision_engine.panel_indicators`."""
+        std_return = self.returns.std
+        return {
+            'historical_volatility': std_return * math.sqrt(252) * 100,
+            'monte_carlo_mean_price': self.prices.mean if self.prices.count else math.nan,
+            'max_price': self.max_price,
+            **{name: moving_average.value for name, moving_average in self.moving_averages.items()},
+            'rsi': self.rsi.value,
+            'sharpe_ratio': self.returns.mean / std_return * math.sqrt(252) if std_return else math.nan,
+        }
+
+    def scores(self):
+        """Composite score for each risk preference, from the current values."""
+        values = self.values()
+        normalized = {
+            'historical_volatility': normalize_value(values['historical_volatility'], 0, 100, inverse=True),
+            'monte_carlo_mean_price': normalize_value(values['monte_carlo_mean_price'], 0, values['max_price']),
+            'ma10': normalize_value(values['ma10'], 0, values['max_price']),
+            'ma50': normalize_value(values['ma50'], 0, values['max_price']),
+            'ma200': normalize_value(values['ma200'], 0, values['max_price']),
+            'rsi': normalize_value(values['rsi'], 0, 100, inverse=True),
+            'sharpe_ratio': normalize_value(values['sharpe_ratio'], -2, 5),
+        }
+        return {risk: sum(weights[name] * normalized[name] for name in INDICATORS) / sum(weights.values())
+                for risk, weights in RISK_WEIGHTS.items()}
+
+    def to_dict(self):
+        return {
+            'last_close': self.last_close,
+            'max_price': self.max_price,
+            'prices': self.prices.to_dict(),
+            'returns': self.returns.to_dict(),
+            'moving_averages': {name: moving_average.to_dict() for name, moving_average in self.moving_averages.items()},
+            'rsi': self.rsi.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        indicators = cls()
+        indicators.last_close, indicators.max_price = state['last_close'], _from_json(state['max_price'], -math.inf)
+        indicators.prices = RunningStats.from_dict(state['prices'])
+        indicators.returns = RunningStats.from_dict(state['returns'])
+        indicators.moving_averages = {name: RollingMean.from_dict(moving_average) for name, moving_average in state['moving_averages'].items()}
+        indicators.rsi = RSI.from_dict(state['rsi'])
+        return indicators
+
+
+def _to_json(value):
+    # Standard JSON has no NaN or infinity; an indicator without enough data is stored as null
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _from_json(value, missing):
+    return missing if value is None else value
+
+
+def save_watchlist(watchlist, path=STATE_PATH):
+    """Write the indicator state of every ticker of `watchlist` ({ticker: LiveIndicators}) to `path` as standard JSON."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Write a private file and move it into place, so a crash never leaves half a file
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump({ticker: _to_json(indicators.to_dict()) for ticker, indicators in watchlist.items()}, f, allow_nan=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_watchlist(path=STATE_PATH):
+    """The watchlist saved at `path`, or an empty one."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {ticker: LiveIndicators.from_dict(state) for ticker, state in json.load(f).items()}
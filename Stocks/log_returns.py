@@ -1,9 +1,18 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import yfinance as yf
+from data_store import fetch_data
+from instrumentation import span
 import plotly.graph_objects as go
 
+# Function to calculate the probability of consecutive days
+def calculate_consecutive_days(data, column, days):
+    consecutive_days_column = f'Consecutive {days} Days {column}'
+    data[consecutive_days_column] = data[column]
+    for i in range(1, days):
+        data[consecutive_days_column] &= data[column].shift(i)
+    return data[consecutive_days_column].sum() / (len(data) - days + 1)
+
 def show_log_returns():
     st.title('📈 Stock Analysis')
 
@@ -13,11 +22,9 @@ def show_log_returns():
     end_date = st.date_input('End Date', value=pd.to_datetime('today'))
     consecutive_days = st.number_input('Number of Consecutive Days', min_value=1, value=2, step=1)
 
-    # Fetch stock data from yfinance
-    stock_data = yf.download(stock_ticker, start=start_date, end=end_date)
-
-    # Reset index to have date as a column
-    stock_data.reset_index(inplace=True)
+    # Fetch stock data from the local store (only missing bars are downloaded)
+    with span('fetch', stock_ticker):
+        stock_data = fetch_data(stock_ticker, start_date, end_date)
 
     # Calculate daily logarithmic returns
     stock_data['Log Returns'] = np.log(stock_data['Close'] / stock_data['Close'].shift(1))
@@ -45,7 +52,8 @@ def show_log_returns():
     )
 
     # Display the plot
-    st.plotly_chart(fig, use_container_width=True)
+    with span('render', 'log returns chart'):
+        st.plotly_chart(fig, use_container_width=True)
 
     # Calculate daily returns (close-to-close)
     stock_data['Daily Return'] = stock_data['Close'].diff()
@@ -54,17 +62,10 @@ def show_log_returns():
     stock_data['Up'] = stock_data['Daily Return'] > 0
     stock_data['Down'] = stock_data['Daily Return'] < 0
 
-    # Function to calculate the probability of consecutive days
-    def calculate_consecutive_days(data, column, days):
-        consecutive_days_column = f'Consecutive {days} Days {column}'
-        data[consecutive_days_column] = data[column]
-        for i in range(1, days):
-            data[consecutive_days_column] &= data[column].shift(i)
-        return data[consecutive_days_column].sum() / (len(data) - days + 1)
-
     # Calculate probabilities
-    probability_up_days = calculate_consecutive_days(stock_data, 'Up', consecutive_days)
-    probability_down_days = calculate_consecutive_days(stock_data, 'Down', consecutive_days)
+    with span('compute', 'consecutive days'):
+        probability_up_days = calculate_consecutive_days(stock_data, 'Up', consecutive_days)
+        probability_down_days = calculate_consecutive_days(stock_data, 'Down', consecutive_days)
 
     # Analyze volatility
     volatility = stock_data['Log Returns'].std()
@@ -106,7 +107,8 @@ def show_log_returns():
         font=dict(color="black")
     )
 
-    st.plotly_chart(fig_volatility, use_container_width=True)
+    with span('render', 'volatility gauge'):
+        st.plotly_chart(fig_volatility, use_container_width=True)
 
     # Add personalized insights with color grading for volatility
     st.write(f"""
@@ -0,0 +1,192 @@
+import argparse
+import os
+import random
+import threading
+import time
+import zlib
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+# Market-data providers behind data_store.
+#
+# `yfinance` downloads from Yahoo Finance. `replay` serves OHLCV fixtures from local
+# files (<ticker>.parquet or <ticker>.csv, as written by `record_fixtures`) and, for
+# tickers without a fixture, a deterministic synthetic series, so the dashboard and
+# the heavy sweeps run offline and reproducibly. Latency can be injected to mimic the
+# network. `download_many` fetches several tickers in one request where the source
+# supports it. The active provider is picked from the environment:
+#
+#   MARKET_DATA_PROVIDER=yfinance|replay   (default yfinance)
+#   MARKET_DATA_REPLAY_DIR=<fixture dir>
+#   MARKET_DATA_LATENCY=<seconds per request>
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+# Synthetic series cover a fixed calendar so any slice of it is the same on every run
+SYNTHETIC_START = '1990-01-01'
+SYNTHETIC_END = '2035-12-31'
+
+# yf.download collects its results in module globals that every call resets, so
+# concurrent calls overwrite each other's data; they are made one at a time
+_yfinance_lock = threading.Lock()
+
+
+def synthetic_ohlcv(ticker, start=SYNTHETIC_START, end=SYNTHETIC_END, seed=0, mu=0.0003, sigma=0.015, initial_price=100.0):
+    """Deterministic geometric-random-walk OHLCV bars for business days in [start, end]."""
+    rng = np.random.default_rng([zlib.crc32(ticker.encode()), seed])
+    dates = pd.bdate_range(start, end, name='Date')
+    n = len(dates)
+    close = initial_price * np.exp(np.cumsum(rng.normal(mu, sigma, n)))
+    open_ = close * np.exp(rng.normal(0, sigma / 4, n))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, sigma / 2, n)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, sigma / 2, n)))
+    volume = rng.integers(1_000_000, 10_000_000, n)
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Adj Close': close, 'Volume': volume}, index=dates)
+
+
+def _empty_bars():
+    return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+
+
+class MarketDataProvider:
+    """Source of daily OHLCV bars."""
+
+    name = 'base'
+
+    def download(self, ticker, start, end):
+        """Daily bars of `ticker` in [start, end), indexed by date."""
+        raise NotImplementedError
+
+    def download_many(self, tickers, start, end):
+        """Daily bars of every ticker in [start, end), as a dict of ticker -> frame."""
+        return {ticker: self.download(ticker, start, end) for ticker in tickers}
+
+
+class YFinanceProvider(MarketDataProvider):
+    name = 'yfinance'
+
+    def download(self, ticker, start, end):
+        import yfinance as yf
+        with _yfinance_lock:
+            return yf.download(ticker, start=start, end=end, progress=False)
+
+    def download_many(self, tickers, start, end):
+        import yfinance as yf
+        tickers = list(tickers)
+        with _yfinance_lock:
+            data = yf.download(tickers, start=start, end=end, group_by='ticker', progress=False)
+        if not isinstance(data.columns, pd.MultiIndex):
+            return {tickers[0]: data}
+        # Rows are the union of all tickers' trading days; a ticker that failed has no column
+        return {ticker: data[ticker].dropna(how='all') if ticker in data.columns.get_level_values(0) else _empty_bars()
+                for ticker in tickers}
+
+
+class ReplayProvider(MarketDataProvider):
+    name = 'replay'
+
+    def __init__(self, fixture_dir=None, latency=0.0, jitter=0.0, synthetic=True, seed=0):
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.synthetic = synthetic
+        self.seed = seed
+        self.frames = {}
+
+    def _fixture_path(self, ticker):
+        if not self.fixture_dir:
+            return None
+        name = quote(ticker, safe='')
+        for extension in ('parquet', 'csv'):
+            path = os.path.join(self.fixture_dir, f'{name}.{extension}')
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _load(self, ticker):
+        if ticker not in self.frames:
+            path = self._fixture_path(ticker)
+            if path is not None and path.endswith('.parquet'):
+                frame = pd.read_parquet(path)
+            elif path is not None:
+                frame = pd.read_csv(path, index_col=0, parse_dates=True)
+            elif self.synthetic:
+                frame = synthetic_ohlcv(ticker, seed=self.seed)
+            else:
+                frame = _empty_bars()
+            self.frames[ticker] = frame.sort_index()
+        return self.frames[ticker]
+
+    def _wait(self):
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+
+    def _slice(self, ticker, start, end):
+        frame = self._load(ticker)
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        return frame[(frame.index >= start) & (frame.index < end)].copy()
+
+    def download(self, ticker, start, end):
+        self._wait()
+        return self._slice(ticker, start, end)
+
+    def download_many(self, tickers, start, end):
+        # One request, so one round of latency
+        self._wait()
+        return {ticker: self._slice(ticker, start, end) for ticker in tickers}
+
+
+PROVIDERS = {
+    'yfinance': YFinanceProvider,
+    'replay': ReplayProvider,
+}
+
+_provider = None
+
+
+def provider_from_env():
+    name = os.environ.get('MARKET_DATA_PROVIDER', 'yfinance')
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown market data provider '{name}', expected one of {sorted(PROVIDERS)}")
+    if name == 'replay':
+        return ReplayProvider(
+            fixture_dir=os.environ.get('MARKET_DATA_REPLAY_DIR'),
+            latency=float(os.environ.get('MARKET_DATA_LATENCY', 0.0)),
+        )
+    return PROVIDERS[name]()
+
+
+def get_provider():
+    """The provider every download goes through."""
+    global _provider
+    if _provider is None:
+        _provider = provider_from_env()
+    return _provider
+
+
+def set_provider(provider):
+    """Replace the active provider (e.g. a ReplayProvider in benchmarks and batch jobs)."""
+    global _provider
+    _provider = provider
+
+
+def record_fixtures(tickers, start, end, fixture_dir, provider=None):
+    """Save bars from `provider` (yfinance by default) as replay fixtures."""
+    provider = provider or YFinanceProvider()
+    os.makedirs(fixture_dir, exist_ok=True)
+    for ticker in tickers:
+        data = provider.download(ticker, start, end)
+        data.index.name = 'Date'
+        data.to_parquet(os.path.join(fixture_dir, f"{quote(ticker, safe='')}.parquet"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record market data fixtures for the replay provider.")
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument("--start", required=True)
+    parser.add_argument("--end", default=pd.Timestamp.today().strftime("%Y-%m-%d"))
+    parser.add_argument("--dir", required=True, help="Fixture directory")
+    args = parser.parse_args()
+    record_fixtures(args.tickers, args.start, args.end, args.dir)
@@ -1,13 +1,15 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import yfinance as yf
+from data_store import fetch_recent_data
+from monte_carlo_engine import simulate_gbm_paths, stream_gbm_statistics
+from instrumentation import span
 import plotly.graph_objects as go
-import plotly.express as px
 
-def monte_carlo_simulation(ticker, days_to_simulate=30, num_simulations=1000):
-    # Fetch stock data from yfinance
-    data = yf.download(ticker, period="5y")
+def fetch_simulation_parameters(ticker):
+    # Fetch the last 5 years of stock data from the local store
+    with span('fetch', ticker):
+        data = fetch_recent_data(ticker, years=5)
     
     # Calculate daily log returns
     data['Log Returns'] = np.log(data['Close'] / data['Close'].shift(1))
@@ -16,66 +18,153 @@ def monte_carlo_simulation(ticker, days_to_simulate=30, num_simulations=1000):
     # Calculate mean and standard deviation of log returns
     mu = data['Log Returns'].mean()
     sigma = data['Log Returns'].std()
-
-    # Perform Monte Carlo simulation
-    simulations = []
     last_price = data['Close'].iloc[-1]
+    return mu, sigma, last_price
 
-    for _ in range(num_simulations):
-        prices = [last_price]
-        for _ in range(days_to_simulate):
-            shock = np.random.normal(mu, sigma)
-            price = prices[-1] * np.exp(shock)
-            prices.append(price)
-        simulations.append(prices)
+def monte_carlo_simulation(ticker, days_to_simulate=30, num_simulations=1000, seed=None, dtype=np.float64):
+    mu, sigma, last_price = fetch_simulation_parameters(ticker)
 
-    return simulations, last_price
+    # Perform Monte Carlo simulation, one row per simulated path
+    with span('compute', 'simulate paths'):
+        simulations = simulate_gbm_paths(last_price, mu, sigma, days_to_simulate, num_simulations, seed=seed, dtype=dtype)
 
-def plot_monte_carlo_simulation(simulations, last_price, days_to_simulate):
-    fig = go.Figure()
+    return simulations, last_price
 
-    for result in simulations:
-        fig.add_trace(go.Scatter(x=list(range(days_to_simulate+1)), y=result, mode='lines', line=dict(color='blue', dash='solid', width=0.5), opacity=0.1))
+def monte_carlo_statistics(ticker, days_to_simulate=30, num_simulations=1000000, seed=None, chunk_size=10000):
+    mu, sigma, last_price = fetch_simulation_parameters(ticker)
+
+    # Stream the paths in chunks and keep only running aggregates
+    with span('compute', 'stream path statistics'):
+        statistics = stream_gbm_statistics(last_price, mu, sigma, days_to_simulate, num_simulations, chunk_size=chunk_size, seed=seed)
+
+    return statistics, last_price
+
+FAN_CHART_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+def representative_paths(simulations, num_paths):
+    # Paths at evenly spaced ranks of the final price, from the worst to the best outcome
+    order = np.argsort(simulations[:, -1])
+    picks = np.unique(np.linspace(0, len(order) - 1, min(num_paths, len(order))).round().astype(int))
+    return simulations[order[picks]]
+
+def paths_trace(paths, days_to_simulate, opacity):
+    # All paths in a single WebGL trace, separated by gaps, instead of one trace per path
+    days = np.arange(days_to_simulate + 1)
+    x = np.tile(np.append(days, np.nan), len(paths))
+    y = np.hstack([paths, np.full((len(paths), 1), np.nan)]).ravel()
+    return go.Scattergl(x=x, y=y, mode='lines', line=dict(color='blue', width=0.5), opacity=opacity, connectgaps=False, name='Simulated paths')
+
+def plot_monte_carlo_simulation(simulations, last_price, days_to_simulate, render_mode='fan', sample_paths=50):
+    if render_mode == 'fan':
+        # Percentile bands plus a small sample of paths: payload does not grow with num_simulations
+        days = np.arange(days_to_simulate + 1)
+        with span('compute', 'path quantiles'):
+            quantiles = dict(zip(FAN_CHART_QUANTILES, np.quantile(simulations, FAN_CHART_QUANTILES, axis=0)))
+        fig = plot_monte_carlo_bands(days, quantiles, simulations.mean(axis=0))
+        fig.add_trace(paths_trace(representative_paths(simulations, sample_paths), days_to_simulate, opacity=0.3))
+        showlegend = True
+    else:
+        fig = go.Figure()
+        fig.add_trace(paths_trace(simulations, days_to_simulate, opacity=0.1))
+        showlegend = False
     
     fig.update_layout(
         title=f"Monte Carlo Simulation: Stock Price Prediction",
         xaxis_title="Days",
         yaxis_title="Price",
-        showlegend=False,
+        showlegend=showlegend,
         paper_bgcolor='rgba(0,0,0,0)',
         plot_bgcolor='rgba(0,0,0,0)'
     )
 
-    st.plotly_chart(fig, use_container_width=True)
+    with span('render', 'paths chart'):
+        st.plotly_chart(fig, use_container_width=True)
 
-    final_prices = [sim[-1] for sim in simulations]
-    fig2 = px.histogram(final_prices, nbins=100, title="Final Price Distribution")
+    # Bin on the server so only the 100 bar heights are sent to the browser
+    final_prices = simulations[:, -1]
+    counts, edges = np.histogram(final_prices, bins=100)
+    fig2 = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges)))
     fig2.update_layout(
+        title="Final Price Distribution",
         xaxis_title="Price",
         yaxis_title="Frequency",
         paper_bgcolor='rgba(0,0,0,0)',
         plot_bgcolor='rgba(0,0,0,0)'
     )
 
-    st.plotly_chart(fig2, use_container_width=True)
+    with span('render', 'final price histogram'):
+        st.plotly_chart(fig2, use_container_width=True)
 
     return final_prices
 
+def plot_monte_carlo_bands(days, quantiles, mean=None, fig=None):
+    fig = fig or go.Figure()
+    levels = sorted(quantiles)
+
+    # Shade symmetric percentile bands, widest first, then the median
+    for low, high in zip(levels[:len(levels) // 2], levels[::-1][:len(levels) // 2]):
+        fig.add_trace(go.Scatter(x=days, y=quantiles[high], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=days, y=quantiles[low], mode='lines', line=dict(width=0), fill='tonexty',
+                                 fillcolor='rgba(0, 0, 255, 0.15)', name=f'{low:.0%} - {high:.0%}'))
+    if 0.5 in quantiles:
+        fig.add_trace(go.Scatter(x=days, y=quantiles[0.5], mode='lines', line=dict(color='blue', width=2), name='Median'))
+    if mean is not None:
+        fig.add_trace(go.Scatter(x=days, y=mean, mode='lines', line=dict(color='black', dash='dash', width=1), name='Mean'))
+    return fig
+
+def plot_monte_carlo_statistics(statistics, days_to_simulate):
+    days = np.arange(days_to_simulate + 1)
+    fig = plot_monte_carlo_bands(days, statistics['quantiles'], statistics['mean'])
+    fig.update_layout(
+        title=f"Monte Carlo Simulation: Stock Price Prediction ({statistics['num_simulations']:,} paths)",
+        xaxis_title="Days",
+        yaxis_title="Price",
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)'
+    )
+    with span('render', 'fan chart'):
+        st.plotly_chart(fig, use_container_width=True)
+
+    counts, edges = statistics['histogram']
+    fig2 = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges)))
+    fig2.update_layout(
+        title="Final Price Distribution",
+        xaxis_title="Price",
+        yaxis_title="Frequency",
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)'
+    )
+    with span('render', 'final price histogram'):
+        st.plotly_chart(fig2, use_container_width=True)
+
 def show_monte_carlo_simulation():
     st.title("Monte Carlo Simulation")
 
     ticker = st.text_input("Enter the ticker symbol (e.g., NVDA for NVIDIA):", value="^IXIC")
     days_to_simulate = st.number_input("Number of days to simulate:", min_value=1, max_value=365, value=30)
-    num_simulations = st.number_input("Number of simulations:", min_value=1, max_value=10000, value=1000)
+    streaming = st.checkbox("Streaming mode (millions of paths, percentile bands only)", value=False)
+    num_simulations = st.number_input("Number of simulations:", min_value=1, max_value=5000000 if streaming else 10000, value=1000000 if streaming else 1000)
+    seed = st.number_input("Random seed (for reproducible runs):", min_value=0, value=42)
+    if not streaming:
+        chart_type = st.radio("Chart type:", ["Fan chart", "All paths"])
 
     if st.button("Run Simulation"):
-        simulations, last_price = monte_carlo_simulation(ticker, days_to_simulate, num_simulations)
-        final_prices = plot_monte_carlo_simulation(simulations, last_price, days_to_simulate)
-
-        # Calculate statistics
-        mean_final_price = np.mean(final_prices)
-        median_final_price = np.median(final_prices)
-        std_final_price = np.std(final_prices)
+        if streaming:
+            statistics, last_price = monte_carlo_statistics(ticker, days_to_simulate, num_simulations, seed=seed)
+            plot_monte_carlo_statistics(statistics, days_to_simulate)
+
+            mean_final_price = statistics['final_mean']
+            median_final_price = statistics['final_median']
+            std_final_price = statistics['final_std']
+        else:
+            simulations, last_price = monte_carlo_simulation(ticker, days_to_simulate, num_simulations, seed=seed)
+            render_mode = 'fan' if chart_type == "Fan chart" else 'paths'
+            final_prices = plot_monte_carlo_simulation(simulations, last_price, days_to_simulate, render_mode=render_mode)
+
+            # Calculate statistics
+            mean_final_price = np.mean(final_prices)
+            median_final_price = np.median(final_prices)
+            std_final_price = np.std(final_prices)
 
         st.write(f"""
         ### Simulation Output Explanation
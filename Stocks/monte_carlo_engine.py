@@ -0,0 +1,135 @@
+import numpy as np
+
+# Geometric Brownian motion path generation for the Monte Carlo pages.
+#
+# The whole (simulations x days) shock matrix is drawn at once from a seeded
+# numpy Generator and cumulated in log space, so a run is a handful of array
+# operations and the same seed always gives the same paths.
+
+
+def estimate_gbm_parameters(close):
+    """Mean and standard deviation of the daily log returns of a close series."""
+    log_returns = np.diff(np.log(np.asarray(close, dtype=float)))
+    return log_returns.mean(), log_returns.std(ddof=1)
+
+
+def simulate_gbm_paths(last_price, mu, sigma, days_to_simulate, num_simulations, seed=None, dtype=np.float64):
+    """Simulated price paths, shape (num_simulations, days_to_simulate + 1).
+
+    Column 0 is `last_price`; each step multiplies by exp(N(mu, sigma)).
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    log_paths = rng.standard_normal((num_simulations, days_to_simulate), dtype=dtype)
+    log_paths *= sigma
+    log_paths += mu
+    np.cumsum(log_paths, axis=1, out=log_paths)
+
+    paths = np.empty((num_simulations, days_to_simulate + 1), dtype=dtype)
+    paths[:, 0] = last_price
+    np.exp(log_paths, out=paths[:, 1:])
+    paths[:, 1:] *= last_price
+    return paths
+
+
+def _merge_moments(count, mean, m2, chunk):
+    # Chan et al. parallel update of per-day mean and sum of squared deviations
+    chunk_count = chunk.shape[0]
+    chunk_mean = chunk.mean(axis=0)
+    chunk_m2 = ((chunk - chunk_mean) ** 2).sum(axis=0)
+    total = count + chunk_count
+    delta = chunk_mean - mean
+    mean = mean + delta * chunk_count / total
+    m2 = m2 + chunk_m2 + delta ** 2 * count * chunk_count / total
+    return total, mean, m2
+
+
+def _sketch_quantiles(counts, lower, width, quantiles):
+    # Linear interpolation inside the log-price bin where the cumulative count crosses q
+    cumulative = np.cumsum(counts, axis=1)
+    total = cumulative[:, -1:]
+    result = {}
+    for q in quantiles:
+        target = q * total
+        bin_index = np.minimum((cumulative < target).sum(axis=1), counts.shape[1] - 1)
+        rows = np.arange(counts.shape[0])
+        before = np.where(bin_index > 0, cumulative[rows, bin_index - 1], 0)
+        in_bin = np.maximum(counts[rows, bin_index], 1)
+        fraction = np.clip((target[:, 0] - before) / in_bin, 0, 1)
+        result[q] = np.exp(lower + (bin_index + fraction) * width)
+    return result
+
+
+def stream_gbm_statistics(last_price, mu, sigma, days_to_simulate, num_simulations, chunk_size=10_000, seed=None,
+                          quantiles=(0.05, 0.25, 0.5, 0.75, 0.95), sketch_bins=2048, histogram_bins=100, dtype=np.float64):
+    """Aggregate statistics of GBM paths generated and discarded chunk by chunk.
+
+    Memory stays bounded by `chunk_size` paths plus a fixed-size sketch per day, so
+    millions of paths can be simulated. Returns a dict with the per-day `mean`, `std`
+    and `quantiles` (one array of days_to_simulate + 1 values each), the final-price
+    `histogram` (counts, bin edges) and the `final_mean`, `final_median` and
+    `final_std` used in the page summary.
+
+    Per-day quantiles come from histograms over log prices spanning +-8 standard
+    deviations of the exact GBM log-price distribution of that day, so their error is
+    well below one bin width (16 sigma sqrt(day) / sketch_bins in log space).
+    """
+    quantiles = tuple(quantiles)
+    if sigma == 0:
+        # A constant-price history: every path is last_price * exp(mu * t), with nothing to bin
+        prices = last_price * np.exp(mu * np.arange(days_to_simulate + 1))
+        return {
+            'num_simulations': num_simulations,
+            'mean': prices,
+            'std': np.zeros(days_to_simulate + 1),
+            'quantiles': {q: prices for q in quantiles},
+            # One bar around the final price, wide enough to be drawn
+            'histogram': (np.array([num_simulations]), prices[-1] * np.array([0.995, 1.005])),
+            'final_mean': prices[-1],
+            'final_median': prices[-1],
+            'final_std': 0.0,
+        }
+
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    days = np.arange(1, days_to_simulate + 1)
+    spread = 8 * sigma * np.sqrt(days)
+    lower = np.log(last_price) + mu * days - spread
+    width = 2 * spread / sketch_bins
+    offsets = np.arange(days_to_simulate) * sketch_bins
+
+    counts = np.zeros(days_to_simulate * sketch_bins, dtype=np.int64)
+    count, mean, m2 = 0, np.zeros(days_to_simulate), np.zeros(days_to_simulate)
+
+    for start in range(0, num_simulations, chunk_size):
+        size = min(chunk_size, num_simulations - start)
+        log_prices = rng.standard_normal((size, days_to_simulate), dtype=dtype)
+        log_prices *= sigma
+        log_prices += mu
+        np.cumsum(log_prices, axis=1, out=log_prices)
+        log_prices += np.log(last_price)
+
+        bins = np.clip(((log_prices - lower) / width).astype(np.int64), 0, sketch_bins - 1)
+        counts += np.bincount((bins + offsets).ravel(), minlength=counts.size)
+        count, mean, m2 = _merge_moments(count, mean, m2, np.exp(log_prices, dtype=np.float64))
+
+    counts = counts.reshape(days_to_simulate, sketch_bins)
+    std = np.sqrt(m2 / count)
+    day_quantiles = _sketch_quantiles(counts, lower, width, quantiles + (0.5,))
+
+    # Final-price histogram: merge adjacent sketch bins of the last day and trim empty tails
+    group_starts = np.arange(0, sketch_bins, max(1, sketch_bins // histogram_bins))
+    final_counts = np.add.reduceat(counts[-1], group_starts)
+    final_edges = np.exp(lower[-1] + np.append(group_starts, sketch_bins) * width[-1])
+    filled = np.nonzero(final_counts)[0]
+    final_counts = final_counts[filled[0]:filled[-1] + 1]
+    final_edges = final_edges[filled[0]:filled[-1] + 2]
+
+    return {
+        'num_simulations': count,
+        'mean': np.concatenate([[last_price], mean]),
+        'std': np.concatenate([[0.0], std]),
+        'quantiles': {q: np.concatenate([[last_price], day_quantiles[q]]) for q in quantiles},
+        'histogram': (final_counts, final_edges),
+        'final_mean': mean[-1],
+        'final_median': day_quantiles[0.5][-1],
+        'final_std': std[-1],
+    }
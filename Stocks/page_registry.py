@@ -0,0 +1,69 @@
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Registry of dashboard pages, imported only when selected.
+#
+# Each page maps to the module and function that renders it. A page module (and the
+# heavy libraries it pulls in, e.g. prophet or arch) is imported the first time the
+# page is opened, and the import time is recorded for the sidebar report. Running
+# this file measures the cold import time of every page in a fresh interpreter.
+
+PAGES = {
+    "Prediction": ("prediction", "show_prediction"),
+    "Volatility Prediction": ("volatility_prediction", "show_volatility_prediction"),
+    "Investment Strategy": ("investment_strategy", "show_investment_strategy"),
+    "Portfolio Weight Optimization": ("streamlit_test", "show_streamlit_test"),
+    "Hedging Strategy": ("hedging", "show_hedging_strategy"),
+    "Log Returns Analysis": ("log_returns", "show_log_returns"),
+    "Monte Carlo Simulation": ("monte_carlo", "show_monte_carlo_simulation"),
+    "Investment Decision": ("show_investment_decision", "show_investment_decision"),
+    "Sector Performance": ("sector_performance", "show_performance_charts"),
+    "Best Performing Companies": ("best_performing_companies", "show_best_performing_companies"),
+}
+
+HEAVY_DEPENDENCIES = ('prophet', 'arch', 'statsmodels', 'cvxopt', 'scipy', 'matplotlib', 'plotly', 'yfinance', 'pyarrow')
+
+import_report = {}
+
+
+def load_page(name):
+    """The render function of page `name`, importing its module on first use."""
+    module_name, function_name = PAGES[name]
+    if module_name not in sys.modules:
+        before = set(sys.modules)
+        start = time.perf_counter()
+        importlib.import_module(module_name)
+        loaded = set(sys.modules) - before
+        import_report[name] = {
+            'Page': name,
+            'Module': module_name,
+            'Import time (s)': round(time.perf_counter() - start, 3),
+            'Modules loaded': len(loaded),
+            'Heavy dependencies': ', '.join(dep for dep in HEAVY_DEPENDENCIES if dep in loaded),
+        }
+    return getattr(sys.modules[module_name], function_name)
+
+
+def import_time_report():
+    """Import measurements of the pages opened so far in this process."""
+    return list(import_report.values())
+
+
+def measure_cold_imports():
+    """Import every page in a fresh interpreter and return the measurements."""
+    report = []
+    for name in PAGES:
+        code = f"import json, page_registry; page_registry.load_page({name!r}); print(json.dumps(page_registry.import_time_report()))"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        report.extend(json.loads(output.strip().splitlines()[-1]))
+    return report
+
+
+if __name__ == "__main__":
+    for row in measure_cold_imports():
+        print(f"{row['Page']:<32}{row['Import time (s)']:>8.3f}s  {row['Heavy dependencies']}")
@@ -0,0 +1,227 @@
+import numpy as np
+import pandas as pd
+from data_store import fetch_price_panel
+from cvxopt import matrix, spmatrix, sparse, solvers
+
+# Portfolio weight optimization used by the Portfolio Weight Optimization page and the batch runner.
+#
+# The risk factor r (1-10) trades variance against return: the QP minimizes
+# (10 - r) / 9 * w'Cw / 2 - r / 10 * mu'w over long-only weights summing to one.
+# `efficient_frontier` solves it for a whole range of risk factors in one pass, so the
+# page can look up any slider position instead of solving again.
+#
+# C is either the dense sample covariance or, for large universes, a factor model from
+# `factor_covariance` (k loadings per asset plus a specific variance). The factor model
+# is solved in its structured form with sparse matrices, so a solve costs about
+# O(n k^2) instead of O(n^3) and no n x n matrix is ever built.
+#
+# `rolling_rebalance_backtest` re-optimizes on a rolling estimation window instead of
+# applying one set of hindsight weights to the whole history.
+
+# Risk factors of the frontier; the integer slider positions are among them
+FRONTIER_RISK_FACTORS = np.linspace(1, 10, 37)
+# Number of statistical factors of the factor-model covariance
+FACTOR_COUNT = 10
+
+def fetch_stock_data(tickers, start_date, end_date):
+    return fetch_price_panel(tickers, start_date, end_date, column='Adj Close')
+
+def calculate_returns_and_covariance(data):
+    returns = data.pct_change().dropna()
+    mean_returns = returns.mean()
+    cov_matrix = returns.cov()
+    return returns, mean_returns, cov_matrix
+
+def factor_covariance(returns, num_factors=FACTOR_COUNT):
+    """Low-rank plus diagonal estimate of the covariance of `returns`: B B' + diag(d).
+
+    The loadings B are the leading principal components of the demeaned returns and d
+    is the variance of each asset they leave unexplained. The estimate stays positive
+    definite when there are more assets than observations, where the sample
+    covariance is singular.
+    """
+    centered = np.asarray(returns, dtype=float)
+    centered = centered - centered.mean(axis=0)
+    num_factors = max(min(num_factors, min(centered.shape) - 1), 1)
+    _, singular_values, components = np.linalg.svd(centered, full_matrices=False)
+    loadings = components[:num_factors].T * (singular_values[:num_factors] / np.sqrt(len(centered) - 1))
+    variances = centered.var(axis=0, ddof=1)
+    # Keep every asset some specific risk, so no direction of the model is riskless
+    specific_variances = np.maximum(variances - (loadings ** 2).sum(axis=1), 1e-3 * variances)
+    return {'loadings': loadings, 'specific_variances': specific_variances}
+
+def portfolio_variance(weights, cov_matrix):
+    """w'Cw for every row of `weights`, with a dense covariance or a factor model."""
+    weights = np.atleast_2d(weights)
+    if isinstance(cov_matrix, dict):
+        return ((weights @ cov_matrix['loadings']) ** 2).sum(axis=1) + (weights ** 2) @ cov_matrix['specific_variances']
+    return np.einsum('ki,ij,kj->k', weights, np.asarray(cov_matrix, dtype=float), weights)
+
+def _qp_matrices(mean_returns, cov_matrix):
+    """P and q of the QP at unit risk and return weight, and the long-only constraints.
+
+    With a factor model the factor exposures y = B'w are extra variables tied to the
+    weights by equality constraints, so P = diag(d, I) is diagonal and every matrix is
+    sparse apart from the n x k loadings. The weights are the first n variables.
+    """
+    mu = np.asarray(mean_returns, dtype=float)
+    n = len(mu)
+    if isinstance(cov_matrix, dict):
+        loadings = cov_matrix['loadings']
+        k = loadings.shape[1]
+        P = spmatrix(np.concatenate([cov_matrix['specific_variances'], np.ones(k)]), range(n + k), range(n + k))
+        q = matrix(np.concatenate([-mu, np.zeros(k)]))
+        G = spmatrix(-1.0, range(n), range(n), (n, n + k))
+        A = sparse([[spmatrix(1.0, [0] * n, range(n), (1, n)), matrix(loadings.T)],
+                    [spmatrix([], [], [], (1, k)), spmatrix(-1.0, range(k), range(k))]])
+        b = matrix(0.0, (k + 1, 1))
+        b[0] = 1.0
+    else:
+        P = matrix(np.asarray(cov_matrix, dtype=float))
+        q = matrix(-mu)
+        G = matrix(-np.eye(n))
+        A = matrix(1.0, (1, n))
+        b = matrix(1.0)
+    h = matrix(0.0, (n, 1))
+    return P, q, G, h, A, b
+
+def optimize_portfolio(mean_returns, cov_matrix, risk_factor):
+    n = len(mean_returns)
+    risk_factor = max(1, min(risk_factor, 10))
+    P, q, G, h, A, b = _qp_matrices(mean_returns, cov_matrix)
+    solvers.options['show_progress'] = False
+    sol = solvers.qp(P * ((10 - risk_factor) / 9.0), q * (risk_factor / 10.0), G, h, A, b)
+    weights = np.array(sol['x']).flatten()[:n]
+    return weights
+
+def _solve_warm(P, q, G, h, A, b, previous=None):
+    """Solve the QP starting from the primal and dual solution of a nearby problem."""
+    if previous is None:
+        return solvers.qp(P, q, G, h, A, b)
+    try:
+        sol = solvers.qp(P, q, G, h, A, b, initvals={name: previous[name] for name in ('x', 's', 'y', 'z')})
+        iterations = sol['iterations']
+    except (ArithmeticError, ValueError):
+        sol, iterations = None, 0
+    if sol is None or sol['status'] != 'optimal':
+        # A warm start can stall (or break down) near a corner of the simplex; solve that problem from scratch
+        sol = solvers.qp(P, q, G, h, A, b)
+        sol['iterations'] += iterations
+    return sol
+
+def efficient_frontier(mean_returns, cov_matrix, risk_factors=FRONTIER_RISK_FACTORS):
+    """Optimal weights for every risk factor, one row each, with their expected return and volatility.
+
+    The QP matrices are built once and each solve is warm-started from the solution
+    for the previous risk factor, which is close to the new optimum.
+    """
+    n = len(mean_returns)
+    risk_factors = np.clip(np.asarray(risk_factors, dtype=float), 1, 10)
+    cov, mu, G, h, A, b = _qp_matrices(mean_returns, cov_matrix)
+    solvers.options['show_progress'] = False
+
+    weights = np.empty((len(risk_factors), n))
+    iterations = np.empty(len(risk_factors), dtype=int)
+    sol = None
+    for k, risk_factor in enumerate(risk_factors):
+        sol = _solve_warm(cov * ((10 - risk_factor) / 9.0), mu * (risk_factor / 10.0), G, h, A, b, sol)
+        weights[k] = np.array(sol['x']).flatten()[:n]
+        iterations[k] = sol['iterations']
+
+    return {
+        'risk_factors': risk_factors,
+        'weights': weights,
+        'expected_returns': weights @ np.asarray(mean_returns, dtype=float),
+        'volatilities': np.sqrt(portfolio_variance(weights, cov_matrix)),
+        'iterations': iterations,
+    }
+
+def frontier_weights(frontier, risk_factor):
+    """Weights of the frontier point closest to `risk_factor`."""
+    return frontier['weights'][np.argmin(np.abs(frontier['risk_factors'] - risk_factor))]
+
+def calculate_leveraged_portfolio_value(data, weights, leverage_factor, initial_investment):
+    portfolio_returns = (data.pct_change().dropna() * weights).sum(axis=1)
+    leveraged_returns = portfolio_returns * leverage_factor
+    portfolio_value = initial_investment * (1 + leveraged_returns).cumprod()
+    return portfolio_value
+
+def rolling_rebalance_backtest(data, risk_factor, leverage_factor, initial_investment, window=126, rebalance_every=5, progress=None,
+                               covariance_model='sample'):
+    """Backtest re-optimizing the weights every `rebalance_every` days on the previous `window` days.
+
+    The window sums of the returns and of their outer products are updated with the
+    days entering and leaving the window, so each rebalance costs O(k n^2) for k new
+    days instead of O(window n^2), and each QP is warm-started from the previous
+    solution. With `covariance_model='factor'` every window is solved with its own
+    `factor_covariance` instead of the sample covariance. Between rebalances the
+    holdings drift with the prices; turnover is the total absolute change from the
+    drifted to the new weights. Returns the leveraged portfolio value from the first
+    rebalance on, the weights and turnover at every rebalance, and a summary.
+    """
+    returns = data.pct_change().dropna()
+    R = returns.to_numpy(dtype=float)
+    num_days, n = R.shape
+    if num_days <= window:
+        raise ValueError(f"The backtest needs more than {window} days of returns, got {num_days}")
+    if covariance_model not in ('sample', 'factor'):
+        raise ValueError(f"Unknown covariance model '{covariance_model}', expected 'sample' or 'factor'")
+    risk_factor = max(1, min(risk_factor, 10))
+    # Only the constraints are reused; P and q change with every window
+    _, _, G, h, A, b = _qp_matrices(np.zeros(n), np.eye(n))
+    solvers.options['show_progress'] = False
+
+    rebalance_days = np.arange(window, num_days, rebalance_every)
+    weights = np.empty((len(rebalance_days), n))
+    turnover = np.empty(len(rebalance_days))
+    iterations = np.empty(len(rebalance_days), dtype=int)
+    daily_returns = np.empty(num_days - window)
+    window_sum = R[:window].sum(axis=0)
+    window_products = R[:window].T @ R[:window]
+    drifted = np.zeros(n)  # start from cash
+    sol = None
+    for k, day in enumerate(rebalance_days):
+        if k > 0 and rebalance_every < window:
+            leaving, entering = R[day - rebalance_every - window:day - window], R[day - rebalance_every:day]
+            window_sum += entering.sum(axis=0) - leaving.sum(axis=0)
+            window_products += entering.T @ entering - leaving.T @ leaving
+        elif k > 0:
+            # The windows do not overlap, nothing to update
+            current = R[day - window:day]
+            window_sum, window_products = current.sum(axis=0), current.T @ current
+        mean_returns = window_sum / window
+        if covariance_model == 'factor':
+            # The loadings are part of the constraints, so the whole structured QP changes with the window
+            P, q, factor_G, factor_h, factor_A, factor_b = _qp_matrices(mean_returns, factor_covariance(R[day - window:day]))
+            sol = _solve_warm(P * ((10 - risk_factor) / 9.0), q * (risk_factor / 10.0), factor_G, factor_h, factor_A, factor_b, sol)
+        else:
+            cov_matrix = (window_products - window * np.outer(mean_returns, mean_returns)) / (window - 1)
+            sol = _solve_warm(matrix(cov_matrix * ((10 - risk_factor) / 9.0)), matrix(mean_returns * (-risk_factor / 10.0)), G, h, A, b, sol)
+        weights[k] = np.array(sol['x']).flatten()[:n]
+        iterations[k] = sol['iterations']
+        turnover[k] = np.abs(weights[k] - drifted).sum()
+
+        # Hold the new weights until the next rebalance, letting them drift with the prices
+        period = R[day:day + rebalance_every]
+        holdings = weights[k] * np.cumprod(1 + period, axis=0)
+        values = holdings.sum(axis=1)
+        daily_returns[day - window:day - window + len(period)] = values / np.concatenate([[1.0], values[:-1]]) - 1
+        drifted = holdings[-1] / values[-1]
+        if progress is not None:
+            progress((k + 1) / len(rebalance_days))
+
+    dates = returns.index[window:]
+    portfolio_value = pd.Series(initial_investment * np.cumprod(1 + leverage_factor * daily_returns), index=dates)
+    years = len(dates) / 252
+    return {
+        'portfolio_value': portfolio_value,
+        'weights': pd.DataFrame(weights, index=returns.index[rebalance_days], columns=returns.columns),
+        'turnover': pd.Series(turnover, index=returns.index[rebalance_days]),
+        'summary': {
+            'rebalances': len(rebalance_days),
+            # The first rebalance buys the initial portfolio, which is not turnover
+            'average_turnover': float(turnover[1:].mean()) if len(turnover) > 1 else 0.0,
+            'annual_turnover': float(turnover[1:].sum() / years),
+            'average_qp_iterations': float(iterations.mean()),
+        },
+    }
@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
-from prophet import Prophet
+from data_store import fetch_data
+from prophet_cache import fit_prophet_forecast
+from instrumentation import span
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
@@ -13,13 +14,8 @@ def show_prediction():
     start_date = st.date_input("Start date:", value=pd.to_datetime("2019-04-01"))
     end_date = st.date_input("End date:", value=pd.to_datetime('today'))  # Default to the current day
 
-    @st.cache_data
-    def fetch_data(ticker, start, end):
-        data = yf.download(ticker, start=start, end=end)
-        data.reset_index(inplace=True)
-        return data
-
-    nasdaq_data = fetch_data(ticker, start_date, end_date)
+    with span('fetch', ticker):
+        nasdaq_data = fetch_data(ticker, start_date, end_date)
 
     # Filter the data to include only values starting from the start date
     filtered_nasdaq_data = nasdaq_data[nasdaq_data['Date'] >= pd.to_datetime(start_date)]
@@ -27,15 +23,9 @@ def show_prediction():
     # Prepare the data for Prophet
     prophet_df = filtered_nasdaq_data[['Date', 'Close']].rename(columns={'Date': 'ds', 'Close': 'y'})
 
-    # Initialize and fit the Prophet model
-    model = Prophet(yearly_seasonality=True, weekly_seasonality=True)
-    model.fit(prophet_df)
-
-    # Create a DataFrame for future dates
-    future_dates = model.make_future_dataframe(periods=12, freq='M')  # Predict for the next 12 months
-
-    # Predict the future values
-    forecast = model.predict(future_dates)
+    # Fit the Prophet model and predict the next 12 months (served from the model cache when the data is unchanged)
+    with span('compute', 'prophet forecast'):
+        forecast, components, _ = fit_prophet_forecast(prophet_df, {'yearly_seasonality': True, 'weekly_seasonality': True}, periods=12, freq='M')
 
     # Plot the forecast using Plotly
     fig_forecast = go.Figure()
@@ -48,24 +38,22 @@ def show_prediction():
         paper_bgcolor='rgba(0,0,0,0)',
         plot_bgcolor='rgba(0,0,0,0)'
     )
-    st.plotly_chart(fig_forecast)
+    with span('render', 'forecast chart'):
+        st.plotly_chart(fig_forecast)
 
     # Display the forecasted values
     # st.write(forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].tail(12))
 
-    # Extract and plot seasonality components using Prophet's plot_components method
-    fig_components = model.plot_components(forecast)
-
     # Plot the seasonality components using Plotly
     fig = make_subplots(rows=2, cols=1, subplot_titles=("Weekly Seasonality", "Yearly Seasonality"))
 
     # Weekly seasonality
-    weekly_data = fig_components.axes[1].lines[0].get_data()
-    fig.add_trace(go.Scatter(x=weekly_data[0], y=weekly_data[1], mode='lines', name='Weekly Seasonality'), row=1, col=1)
+    weekly_data = components['weekly']
+    fig.add_trace(go.Scatter(x=weekly_data['x'], y=weekly_data['y'], mode='lines', name='Weekly Seasonality'), row=1, col=1)
 
     # Yearly seasonality
-    yearly_data = fig_components.axes[2].lines[0].get_data()
-    fig.add_trace(go.Scatter(x=yearly_data[0], y=yearly_data[1], mode='lines', name='Yearly Seasonality'), row=2, col=1)
+    yearly_data = components['yearly']
+    fig.add_trace(go.Scatter(x=yearly_data['x'], y=yearly_data['y'], mode='lines', name='Yearly Seasonality'), row=2, col=1)
 
     fig.update_layout(
         height=800, 
@@ -73,6 +61,7 @@ def show_prediction():
         paper_bgcolor='rgba(0,0,0,0)',
         plot_bgcolor='rgba(0,0,0,0)'
     )
-    st.plotly_chart(fig)
+    with span('render', 'seasonality chart'):
+        st.plotly_chart(fig)
 
 # To use the updated function, ensure this is called in your main Streamlit app.
\ No newline at end of file
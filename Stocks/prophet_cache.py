@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+import prophet
+from prophet import Prophet
+from prophet.plot import seasonality_plot_df
+from prophet.serialize import model_from_json, model_to_json
+
+from instrumentation import count
+from result_cache import evict, load_entry, store_entry
+
+# Disk cache of fitted Prophet models for the prediction pages.
+#
+# Entries are keyed by a content hash of the training frame plus the model and
+# forecast configuration. Each entry stores the serialized model, its forecast and
+# the seasonality component curves, so a hit skips the Stan optimization entirely.
+# Least recently used entries are evicted once the cache exceeds its size budget.
+
+CACHE_DIR = os.environ.get("STOCKS_MODEL_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".stockpredictions", "prophet"))
+MAX_CACHE_BYTES = int(os.environ.get("STOCKS_MODEL_CACHE_BYTES", 500 * 1024 ** 2))
+
+
+def cache_key(prophet_df, model_config, periods, freq):
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(prophet_df[['ds', 'y']], index=False).values.tobytes())
+    digest.update(json.dumps({'model': model_config, 'periods': periods, 'freq': freq, 'prophet': prophet.__version__},
+                             sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def seasonality_components(model):
+    """Weekly and yearly seasonality curves, as drawn by `Prophet.plot_components`."""
+    components = {}
+    if 'weekly' in model.seasonalities:
+        days = pd.date_range(start='2017-01-01', periods=7)
+        seasonal = model.predict_seasonal_components(seasonality_plot_df(model, days))
+        components['weekly'] = pd.DataFrame({'x': range(len(days)), 'y': seasonal['weekly'].to_numpy()})
+    if 'yearly' in model.seasonalities:
+        days = pd.date_range(start='2017-01-01', periods=365)
+        seasonal = model.predict_seasonal_components(seasonality_plot_df(model, days))
+        components['yearly'] = pd.DataFrame({'x': days, 'y': seasonal['yearly'].to_numpy()})
+    return components
+
+
+def _read_entry(path, load_model):
+    forecast = pd.read_parquet(os.path.join(path, 'forecast.parquet'))
+    components = {
+        name[len('component_'):-len('.parquet')]: pd.read_parquet(os.path.join(path, name))
+        for name in os.listdir(path) if name.startswith('component_')
+    }
+    model = None
+    if load_model:
+        with open(os.path.join(path, 'model.json')) as f:
+            model = model_from_json(f.read())
+    return forecast, components, model
+
+
+def _write_entry(path, model, forecast, components):
+    with open(os.path.join(path, 'model.json'), 'w') as f:
+        f.write(model_to_json(model))
+    forecast.to_parquet(os.path.join(path, 'forecast.parquet'))
+    for name, frame in components.items():
+        frame.to_parquet(os.path.join(path, f'component_{name}.parquet'))
+
+
+def fit_prophet_forecast(prophet_df, model_config=None, periods=12, freq='M', load_model=False,
+                         cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Fit (or load from the cache) a Prophet model and forecast `periods` ahead.
+
+    Returns the forecast frame, the seasonality component curves and, when
+    `load_model` is set (or on a cache miss), the fitted model.
+    """
+    model_config = model_config or {}
+    path = os.path.join(cache_dir, cache_key(prophet_df, model_config, periods, freq))
+
+    result = load_entry(path, lambda entry: _read_entry(entry, load_model))
+    if result is not None:
+        count('prophet_model', hit=True)
+        return result
+
+    count('prophet_model', hit=False)
+    model = Prophet(**model_config)
+    model.fit(prophet_df)
+    forecast = model.predict(model.make_future_dataframe(periods=periods, freq=freq))
+    components = seasonality_components(model)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    store_entry(path, lambda directory: _write_entry(directory, model, forecast, components))
+    evict(cache_dir, max_bytes)
+    return forecast, components, model
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import count
+
+# Disk cache of analysis results (sweep tables, hedging grids, GARCH fits, portfolio weights).
+#
+# An entry is keyed by the analysis name, its parameters and a fingerprint of the price
+# data it was computed from. The parameters identify the question (ticker, start date,
+# grid, ...) and the fingerprint the data that answered it: when the same question is
+# cached again with a new fingerprint, the price data was extended (or revised) and the
+# older answers are removed. A result is a dict of named parts; tables are stored as
+# Parquet, arrays in one npz file and everything else in the entry's JSON metadata.
+# Least recently used entries are evicted once the cache exceeds its size budget.
+# `load_entry`, `store_entry` and `evict` work on any entry directory and are shared
+# with the Prophet model cache.
+
+CACHE_DIR = os.environ.get("STOCKS_RESULT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".stockpredictions", "results"))
+MAX_CACHE_BYTES = int(os.environ.get("STOCKS_RESULT_CACHE_BYTES", 200 * 1024 ** 2))
+
+
+def data_fingerprint(*data):
+    """Content hash of the price frames or series a result is computed from."""
+    digest = hashlib.sha256()
+    for frame in data:
+        digest.update(pd.util.hash_pandas_object(frame, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def _to_json(value):
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return str(value)
+
+
+def family_key(analysis, params):
+    return hashlib.sha256(json.dumps({'analysis': analysis, 'params': params}, sort_keys=True, default=_to_json).encode()).hexdigest()
+
+
+def _entry_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Remove least recently used entries until the cache fits in `max_bytes`."""
+    if not os.path.isdir(cache_dir):
+        return
+    entries = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if not name.startswith('.')]
+    entries = sorted((path for path in entries if os.path.isdir(path)), key=os.path.getmtime)
+    total = sum(_entry_size(path) for path in entries)
+    for path in entries:
+        if total <= max_bytes:
+            break
+        total -= _entry_size(path)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def invalidate(analysis, params, keep=None, cache_dir=CACHE_DIR):
+    """Remove the cached answers to (analysis, params), except the entry named `keep`."""
+    if not os.path.isdir(cache_dir):
+        return
+    prefix = family_key(analysis, params)[:32] + '_'
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix) and name != keep:
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+
+def load_entry(path, read):
+    """`read(path)` for the cache entry at `path`, or None when there is no entry.
+
+    A damaged entry is removed, so that it is computed and stored again.
+    """
+    if not os.path.isdir(path):
+        return None
+    try:
+        result = read(path)
+    except (OSError, ValueError, KeyError):
+        shutil.rmtree(path, ignore_errors=True)
+        return None
+    try:
+        # Mark the entry as recently used for `evict`
+        os.utime(path)
+    except FileNotFoundError:
+        # Evicted by another session since it was read
+        pass
+    return result
+
+
+def store_entry(path, write):
+    """Store a cache entry at `path`, filled in by `write(directory)`."""
+    # Build the entry in a private directory and move it into place in one step
+    tmp_path = tempfile.mkdtemp(prefix='.tmp', dir=os.path.dirname(path))
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another session stored the same entry concurrently, or the disk is full
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.isdir(path):
+            raise
+    except BaseException:
+        # `evict` skips temporary directories, so nothing else would remove this one
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+
+def _read_entry(path):
+    with open(os.path.join(path, 'meta.json')) as f:
+        parts = json.load(f)['values']
+    for name in os.listdir(path):
+        if name.endswith('.parquet'):
+            parts[name[:-len('.parquet')]] = pd.read_parquet(os.path.join(path, name))
+    if os.path.exists(os.path.join(path, 'arrays.npz')):
+        with np.load(os.path.join(path, 'arrays.npz'), allow_pickle=False) as arrays:
+            parts.update({name: arrays[name] for name in arrays.files})
+    return parts
+
+
+def _write_entry(path, analysis, params, parts):
+    arrays, values = {}, {}
+    for name, part in parts.items():
+        if isinstance(part, pd.DataFrame):
+            part.to_parquet(os.path.join(path, f'{name}.parquet'))
+        elif isinstance(part, np.ndarray):
+            arrays[name] = part
+        else:
+            values[name] = part
+    if arrays:
+        np.savez_compressed(os.path.join(path, 'arrays.npz'), **arrays)
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'analysis': analysis, 'params': params, 'values': values}, f, default=_to_json)
+
+
+def cached_result(analysis, params, data, compute, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Return `compute()` for (analysis, params, data), from the cache when it was computed before.
+
+    `data` is the price frame or series (or a tuple of them) the result depends on and
+    `compute` returns a dict of named parts: DataFrames, NumPy arrays or JSON values.
+    """
+    data = data if isinstance(data, tuple) else (data,)
+    name = f"{family_key(analysis, params)[:32]}_{data_fingerprint(*data)[:32]}"
+    path = os.path.join(cache_dir, name)
+
+    parts = load_entry(path, _read_entry)
+    if parts is not None:
+        count('result_cache', hit=True)
+        return parts
+
+    count('result_cache', hit=False)
+    parts = compute()
+    os.makedirs(cache_dir, exist_ok=True)
+    store_entry(path, lambda directory: _write_entry(directory, analysis, params, parts))
+    invalidate(analysis, params, keep=name, cache_dir=cache_dir)
+    evict(cache_dir, max_bytes)
+    return parts
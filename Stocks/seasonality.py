@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
-from prophet import Prophet
+from data_store import fetch_data
+from prophet_cache import fit_prophet_forecast
+from instrumentation import span
 import matplotlib.pyplot as plt
 import plotly.express as px
 
@@ -16,13 +17,8 @@ def show_prediction():
     start_date = st.date_input("Start date:", value=pd.to_datetime("2019-04-01"))
     end_date = st.date_input("End date:", value=pd.to_datetime("2024-07-04"))
 
-    @st.cache_data
-    def fetch_data(ticker, start, end):
-        data = yf.download(ticker, start=start, end=end)
-        data.reset_index(inplace=True)
-        return data
-
-    nasdaq_data = fetch_data(ticker, start_date, end_date)
+    with span('fetch', ticker):
+        nasdaq_data = fetch_data(ticker, start_date, end_date)
 
     # Filter the data to include only values starting from the start date
     filtered_nasdaq_data = nasdaq_data[nasdaq_data['Date'] >= pd.to_datetime(start_date)]
@@ -30,31 +26,27 @@ def show_prediction():
     # Prepare the data for Prophet
     prophet_df = filtered_nasdaq_data[['Date', 'Close']].rename(columns={'Date': 'ds', 'Close': 'y'})
 
-    # Initialize and fit the Prophet model
-    model = Prophet()
-    model.fit(prophet_df)
-
-    # Create a DataFrame for future dates
-    future_dates = model.make_future_dataframe(periods=12, freq='M')  # Predict for the next 12 months
-
-    # Predict the future values
-    forecast = model.predict(future_dates)
+    # Fit the Prophet model and predict the next 12 months (served from the model cache when the data is unchanged)
+    with span('compute', 'prophet forecast'):
+        forecast, _, model = fit_prophet_forecast(prophet_df, periods=12, freq='M', load_model=True)
 
     # Plot the forecast
-    fig1, ax1 = plt.subplots()
-    model.plot(forecast, ax=ax1)
-    ax1.set_title('Stock Price Forecast')
-    ax1.set_xlabel('Date')
-    ax1.set_ylabel('Stock Close Value')
-    plt.grid(True)
-    st.pyplot(fig1)
+    with span('render', 'forecast chart'):
+        fig1, ax1 = plt.subplots()
+        model.plot(forecast, ax=ax1)
+        ax1.set_title('Stock Price Forecast')
+        ax1.set_xlabel('Date')
+        ax1.set_ylabel('Stock Close Value')
+        plt.grid(True)
+        st.pyplot(fig1)
 
     # Display the forecasted values
     st.write(forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].tail(12))
 
     # Plot seasonality components
-    fig2 = model.plot_components(forecast)
-    st.pyplot(fig2)
+    with span('render', 'seasonality chart'):
+        fig2 = model.plot_components(forecast)
+        st.pyplot(fig2)
 
 # Streamlit app
 st.sidebar.title("Navigation")
@@ -1,19 +1,17 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from bulk_download import fetch_close_panel
+from data_store import recent_range
+from instrumentation import span
 
-def fetch_data(ticker):
-    return yf.Ticker(ticker).history(period="1y")
-
-def calculate_performance(data, period):
-    start_date = (datetime.now() - timedelta(days=period)).replace(tzinfo=None)
-    data.index = data.index.tz_localize(None)
-    filtered_data = data.loc[start_date:]
-    if len(filtered_data) < 2:
+def calculate_performance(close, period):
+    start_date = datetime.now() - timedelta(days=period)
+    filtered_close = close.dropna().loc[start_date:]
+    if len(filtered_close) < 2:
         return None
-    return ((filtered_data['Close'][-1] - filtered_data['Close'][0]) / filtered_data['Close'][0]) * 100
+    return ((filtered_close.iloc[-1] - filtered_close.iloc[0]) / filtered_close.iloc[0]) * 100
 
 def show_performance_charts():
     st.title("Sector Performance Over Different Periods")
@@ -60,16 +58,20 @@ def show_performance_charts():
         'Year to Date': (datetime.now() - datetime(datetime.now().year, 1, 1)).days
     }
 
-    # Fetch the data for each ETF
-    data = {}
-    for sector, ticker in sectors.items():
-        data[sector] = fetch_data(ticker)
+    # Fetch one year of dividend-adjusted closes for all ETFs concurrently
+    start, end = recent_range(years=1)
+    with span('fetch', f'{len(sectors)} sector ETFs'):
+        data, failures = fetch_close_panel(list(sectors.values()), start, end, column="Adj Close")
+    if failures:
+        st.warning(f"Could not load data for: {', '.join(failures)}")
 
     # Calculate performance for each period
     performances = {period: {} for period in periods.keys()}
     for period_name, period_days in periods.items():
-        for sector in sectors.keys():
-            performance = calculate_performance(data[sector], period_days)
+        for sector, ticker in sectors.items():
+            if ticker not in data:
+                continue
+            performance = calculate_performance(data[ticker], period_days)
             if performance is not None:
                 performances[period_name][sector] = performance
 
@@ -114,7 +116,8 @@ def show_performance_charts():
         )
 
         # Display the plot
-        st.plotly_chart(fig, use_container_width=True)
+        with span('render', f'{period_name} chart'):
+            st.plotly_chart(fig, use_container_width=True)
 
 if __name__ == "__main__":
     show_performance_charts()
\ No newline at end of file
@@ -1,17 +1,15 @@
+import io
 import streamlit as st
 import pandas as pd
 import numpy as np
-import yfinance as yf
+from data_store import fetch_data
+from bulk_download import fetch_close_panel
+from best_performing_companies import SECTORS, fetch_tickers_in_sector
+from decision_engine import RISK_WEIGHTS, normalize_value, screen_panel, score_history, score_signal, signal_backtest
+from instrumentation import span
 import plotly.graph_objects as go
 import plotly.express as px
 
-def normalize_value(value, min_value, max_value, inverse=False):
-    """Normalize the value to a 0-100 scale."""
-    normalized = (value - min_value) / (max_value - min_value) * 100
-    if inverse:
-        return 100 - normalized
-    return normalized
-
 def calculate_composite_score(values, weights):
     return np.average(values, weights=weights)
 
@@ -38,35 +36,72 @@ def calculate_sharpe_ratio(stock_data):
     sharpe_ratio = avg_daily_return / std_daily_return * np.sqrt(252)
     return sharpe_ratio
 
+def read_ticker_list(uploaded_file):
+    """Tickers from an uploaded CSV (first column, or a `Ticker` column) or plain text file."""
+    text = uploaded_file.getvalue().decode()
+    if uploaded_file.name.lower().endswith('.csv'):
+        table = pd.read_csv(io.StringIO(text))
+        column = 'Ticker' if 'Ticker' in table.columns else table.columns[0]
+        return [str(ticker).strip() for ticker in table[column].dropna()]
+    return [ticker.strip() for ticker in text.replace(',', '\n').splitlines() if ticker.strip()]
+
+def show_screener(start_date, end_date, risk_preference):
+    universe = st.selectbox("Universe:", ['All sectors'] + SECTORS + ['Uploaded list'])
+    if universe == 'Uploaded list':
+        uploaded_file = st.file_uploader("Ticker list (CSV with a Ticker column, or one ticker per line):", type=['csv', 'txt'])
+        if uploaded_file is None:
+            return
+        tickers = read_ticker_list(uploaded_file)
+    else:
+        sectors = SECTORS if universe == 'All sectors' else [universe]
+        tickers = [ticker for sector in sectors for ticker, _ in fetch_tickers_in_sector(sector)]
+
+    with span('fetch', f'{len(tickers)} tickers'):
+        close_panel, failures = fetch_close_panel(tickers, start_date, end_date)
+    if failures:
+        st.warning(f"Could not load data for: {', '.join(failures)}")
+    if close_panel.empty:
+        st.write("No data available for the selected tickers and date range.")
+        return
+
+    # Every indicator for every ticker in one pass over the aligned panel, scored for all five risk preferences
+    with span('compute', 'screener'):
+        table = screen_panel(close_panel, risk_preference)
+    st.subheader(f"Ranking for risk preference {risk_preference}")
+    st.dataframe(table.style.format('{:.2f}'))
+    st.download_button("Download ranking (CSV)", table.to_csv(), file_name="screener.csv", mime="text/csv")
+
 def show_investment_decision():
     st.title("Investment Decision Index")
 
+    mode = st.radio("Mode:", ["Single ticker", "Screener"], help="The screener scores every ticker of a sector universe or an uploaded list.")
+
     # Input fields for ticker and date range
-    ticker = st.text_input("Enter the ticker symbol (e.g., NVDA for NVIDIA):", value="^IXIC")
+    if mode == "Single ticker":
+        ticker = st.text_input("Enter the ticker symbol (e.g., NVDA for NVIDIA):", value="^IXIC")
     start_date = st.date_input("Start date:", value=pd.to_datetime("2019-04-01"))
     end_date = st.date_input("End date:", value=pd.to_datetime('today'))
 
     # Slider for risk preference
     risk_preference = st.slider("Select your risk preference (1-5):", 1, 5, 3)
 
-    # Fetch data based on inputs
-    @st.cache_data
-    def fetch_data(ticker, start, end):
-        data = yf.download(ticker, start=start, end=end)
-        data.reset_index(inplace=True)
-        return data
+    if mode == "Screener":
+        show_screener(start_date, end_date, risk_preference)
+        return
 
     # Fetch the stock data
-    stock_data = fetch_data(ticker, start_date, end_date)
+    with span('fetch', ticker):
+        stock_data = fetch_data(ticker, start_date, end_date)
 
-    # Calculate moving averages
-    stock_data = calculate_moving_averages(stock_data)
+    with span('compute', 'indicators'):
+        # Calculate moving averages
+        stock_data = calculate_moving_averages(stock_data)
 
-    # Calculate various indicators
-    historical_volatility = stock_data['Close'].pct_change().std() * np.sqrt(252) * 100
-    monte_carlo_mean_price = stock_data['Close'].mean()
-    rsi = calculate_rsi(stock_data)
-    sharpe_ratio = calculate_sharpe_ratio(stock_data)
+        # Calculate various indicators
+        historical_volatility = stock_data['Close'].pct_change().std() * np.sqrt(252) * 100
+        monte_carlo_mean_price = stock_data['Close'].mean()
+        rsi = calculate_rsi(stock_data)
+        sharpe_ratio = calculate_sharpe_ratio(stock_data)
 
     # Normalize indicators to a 0-100 scale
     normalized_historical_volatility = normalize_value(historical_volatility, 0, 100, inverse=True)  # Inverse because lower is better
@@ -88,60 +123,11 @@ def show_investment_decision():
         "sharpe_ratio": normalized_sharpe_ratio
     }
 
-    # Define weights for each indicator based on risk preference
-    if risk_preference == 1:
-        weights = {
-            "historical_volatility": 0.4,
-            "monte_carlo_mean_price": 0.1,
-            "ma10": 0.1,
-            "ma50": 0.1,
-            "ma200": 0.1,
-            "rsi": 0.1,
-            "sharpe_ratio": 0.1,
-        }
-    elif risk_preference == 2:
-        weights = {
-            "historical_volatility": 0.3,
-            "monte_carlo_mean_price": 0.1,
-            "ma10": 0.1,
-            "ma50": 0.1,
-            "ma200": 0.1,
-            "rsi": 0.1,
-            "sharpe_ratio": 0.2,
-        }
-    elif risk_preference == 3:
-        weights = {
-            "historical_volatility": 0.2,
-            "monte_carlo_mean_price": 0.15,
-            "ma10": 0.1,
-            "ma50": 0.1,
-            "ma200": 0.1,
-            "rsi": 0.1,
-            "sharpe_ratio": 0.25,
-        }
-    elif risk_preference == 4:
-        weights = {
-            "historical_volatility": 0.1,
-            "monte_carlo_mean_price": 0.2,
-            "ma10": 0.1,
-            "ma50": 0.1,
-            "ma200": 0.1,
-            "rsi": 0.1,
-            "sharpe_ratio": 0.3,
-        }
-    else:  # risk_preference == 5
-        weights = {
-            "historical_volatility": 0.05,
-            "monte_carlo_mean_price": 0.25,
-            "ma10": 0.1,
-            "ma50": 0.1,
-            "ma200": 0.1,
-            "rsi": 0.1,
-            "sharpe_ratio": 0.3,
-        }
+    # Weights for each indicator based on risk preference
+    weights = RISK_WEIGHTS[risk_preference]
 
     # Calculate composite score
-    composite_score = calculate_composite_score(list(indicators.values()), list(weights.values()))
+    composite_score = calculate_composite_score(list(indicators.values()), [weights[name] for name in indicators])
 
     # Display the results
     st.write(f"Composite Score: {composite_score:.2f}")
@@ -226,7 +212,8 @@ def show_investment_decision():
         plot_bgcolor="rgba(0,0,0,0)"
     )
 
-    st.plotly_chart(fig_composite, use_container_width=True)
+    with span('render', 'composite score bar'):
+        st.plotly_chart(fig_composite, use_container_width=True)
 
     # Create a bar chart with a pointer for RSI
     fig_rsi = go.Figure()
@@ -296,7 +283,43 @@ def show_investment_decision():
         plot_bgcolor="rgba(0,0,0,0)"
     )
 
-    st.plotly_chart(fig_rsi, use_container_width=True)
+    with span('render', 'RSI bar'):
+        st.plotly_chart(fig_rsi, use_container_width=True)
+
+    # The same score for every date, from the prices up to that date
+    with span('compute', 'score history'):
+        close = stock_data.set_index('Date')['Close']
+        score = score_history(close)[f'Score (risk {risk_preference})']
+        backtest = signal_backtest(close, score_signal(score))
+
+    fig_history = go.Figure()
+    fig_history.add_trace(go.Scatter(x=score.index, y=score.values, mode='lines', name='Composite Score'))
+    fig_history.add_hline(y=60, line=dict(color='green', dash='dash'))
+    fig_history.add_hline(y=40, line=dict(color='red', dash='dash'))
+    fig_history.update_layout(
+        title=f'Composite Score History (risk preference {risk_preference})',
+        xaxis_title='Date',
+        yaxis_title='Composite Score',
+        template='plotly_white',
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)"
+    )
+    with span('render', 'score history chart'):
+        st.plotly_chart(fig_history, use_container_width=True)
+
+    fig_signal = go.Figure()
+    for column in backtest.columns:
+        fig_signal.add_trace(go.Scatter(x=backtest.index, y=backtest[column], mode='lines', name=column))
+    fig_signal.update_layout(
+        title='Growth of 1 Following the Score (in above 60, out below 40) vs. Buy and Hold',
+        xaxis_title='Date',
+        yaxis_title='Growth',
+        template='plotly_white',
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)"
+    )
+    with span('render', 'score signal chart'):
+        st.plotly_chart(fig_signal, use_container_width=True)
 
 # Explanations for indicators
     st.write("""
@@ -306,4 +329,5 @@ def show_investment_decision():
 - **MA10, MA50, MA200:** These are moving averages over 10, 50, and 200 days, respectively. They help identify trends and potential support/resistance levels.
 - **RSI:** The Relative Strength Index measures the speed and change of price movements. Values below 30 indicate the stock may be oversold, while values above 70 indicate the stock may be overbought.
 - **Sharpe Ratio:** This measures the risk-adjusted return of the stock. Higher values indicate better risk-adjusted performance.
+- **Composite Score History:** The score of every date, computed only from the prices up to that date. The signal chart invests when the score rises above 60, sells when it falls below 40 and otherwise keeps its position.
 """)
\ No newline at end of file
@@ -0,0 +1,257 @@
+import numpy as np
+import pandas as pd
+
+# Array-based engine behind the threshold-buying strategy in investment_strategy.py.
+#
+# The strategy adds `monthly_addition` to a wallet on every trading day that falls on
+# the 10th of the month and moves the whole wallet into the leveraged position on the
+# first day whose log return is at or below `threshold`. Two facts make the sweep cheap:
+#   - whether a day is a buy day only depends on the threshold (any positive addition
+#     fills the wallet on the same deposit days), and
+#   - the final value is linear in the monthly addition.
+# So every threshold is solved once over whole columns and the addition axis is a
+# broadcast. Leverage only scales the log growth of the position, so it is a cheap
+# extra axis too, which the coarse-to-fine `adaptive_search` uses.
+
+
+def prepare_strategy_data(nasdaq_data, leverage_factor):
+    """Add the log return columns the strategy works on."""
+    nasdaq_data['Log Returns'] = np.log(nasdaq_data['Close'] / nasdaq_data['Close'].shift(1))
+    nasdaq_data.dropna(inplace=True)
+    nasdaq_data['Leveraged Log Returns'] = nasdaq_data['Log Returns'] * leverage_factor
+    return nasdaq_data
+
+
+def simulate_investment(threshold, initial_investment, monthly_addition, nasdaq_data):
+    """Reference row-by-row simulation of the strategy (kept for validation)."""
+    wallet = 0
+    cumulative_value = initial_investment
+    investment_values = []
+    wallet_values = []
+    buy_dates = []
+    buy_amounts = []
+
+    for i, row in nasdaq_data.iterrows():
+        if row['Date'].day == 10:
+            wallet += monthly_addition
+
+        daily_return = np.exp(row['Leveraged Log Returns'])
+        cumulative_value *= daily_return
+        investment_values.append(cumulative_value)
+        wallet_values.append(wallet)
+
+        if row['Log Returns'] <= threshold and wallet > 0:
+            cumulative_value += wallet
+            buy_dates.append(row['Date'])
+            buy_amounts.append(cumulative_value)
+            wallet = 0
+
+    return cumulative_value, investment_values, wallet_values, buy_dates, buy_amounts
+
+
+def strategy_arrays(nasdaq_data):
+    """Extract the columns used by the engine as NumPy arrays."""
+    dates = pd.to_datetime(nasdaq_data['Date'])
+    # Number of deposits made up to and including each day
+    deposits = np.cumsum((dates.dt.day == 10).to_numpy()).astype(np.int64)
+    log_returns = nasdaq_data['Log Returns'].to_numpy(dtype=float)
+    cumulative_log_growth = np.cumsum(nasdaq_data['Leveraged Log Returns'].to_numpy(dtype=float))
+    return dates.to_numpy(), deposits, log_returns, cumulative_log_growth
+
+
+def buy_schedule(log_returns, deposits, thresholds):
+    """Return the number of deposits invested on each day, one row per threshold.
+
+    A trigger day buys when at least one deposit arrived since the previous trigger
+    day: if that trigger bought, the wallet was emptied then, and if it did not, the
+    wallet was already empty.
+    """
+    thresholds = np.atleast_1d(np.asarray(thresholds, dtype=float))
+    trigger = log_returns[None, :] <= thresholds[:, None]
+    last_trigger_deposits = np.maximum.accumulate(np.where(trigger, deposits[None, :], 0), axis=1)
+    previous = np.zeros_like(last_trigger_deposits)
+    previous[:, 1:] = last_trigger_deposits[:, :-1]
+    buy = trigger & (deposits[None, :] > previous)
+    return np.where(buy, deposits[None, :] - previous, 0)
+
+
+def sweep_final_values(log_returns, deposits, cumulative_log_growth, thresholds, monthly_additions, initial_investment):
+    """Final strategy values for every (threshold, monthly addition) pair."""
+    monthly_additions = np.atleast_1d(np.asarray(monthly_additions, dtype=float))
+    units = buy_schedule(log_returns, deposits, thresholds)
+    growth_to_end = np.exp(cumulative_log_growth[-1] - cumulative_log_growth)
+    invested_growth = units @ growth_to_end
+    base_value = initial_investment * np.exp(cumulative_log_growth[-1])
+    # Non-positive additions never fill the wallet, so nothing is ever bought
+    return base_value + np.outer(invested_growth, np.clip(monthly_additions, 0, None))
+
+
+def sweep_investment(threshold_values, monthly_addition_values, initial_investment, nasdaq_data, progress=None, chunk_size=64):
+    """Evaluate the whole threshold x monthly addition grid, `chunk_size` thresholds at a time.
+
+    Returns a 2-D array of final values indexed [threshold, monthly addition], equal to
+    what `simulate_investment` returns for each pair. `progress(fraction, best)` is
+    called after every chunk with the best parameter pair found so far.
+    """
+    threshold_values = np.atleast_1d(np.asarray(threshold_values, dtype=float))
+    monthly_addition_values = np.atleast_1d(np.asarray(monthly_addition_values, dtype=float))
+    _, deposits, log_returns, cumulative_log_growth = strategy_arrays(nasdaq_data)
+    if len(log_returns) == 0:
+        return np.full((len(threshold_values), len(monthly_addition_values)), float(initial_investment))
+
+    final_values = np.empty((len(threshold_values), len(monthly_addition_values)))
+    for start in range(0, len(threshold_values), chunk_size):
+        stop = min(start + chunk_size, len(threshold_values))
+        final_values[start:stop] = sweep_final_values(log_returns, deposits, cumulative_log_growth, threshold_values[start:stop],
+                                                      monthly_addition_values, initial_investment)
+        if progress is not None:
+            i, j = np.unravel_index(np.argmax(final_values[:stop]), final_values[:stop].shape)
+            progress(stop / len(threshold_values), {'Threshold': threshold_values[i], 'Monthly Addition': monthly_addition_values[j],
+                                                    'Final Value': final_values[i, j]})
+    return final_values
+
+
+def strategy_paths(dates, deposits, log_returns, cumulative_log_growth, threshold, initial_investment, monthly_addition):
+    """Investment and wallet paths plus buy events for a single parameter pair."""
+    units = buy_schedule(log_returns, deposits, [threshold])[0]
+    if monthly_addition <= 0:
+        units = np.zeros_like(units)
+    growth = np.exp(cumulative_log_growth)
+    # Value right after the (possible) buy on each day
+    value_after_buy = growth * (initial_investment + monthly_addition * np.cumsum(units / growth))
+    buy = units > 0
+    investment_values = value_after_buy - monthly_addition * units
+
+    last_buy_deposits = np.maximum.accumulate(np.where(buy, deposits, 0))
+    previous_buy_deposits = np.zeros_like(last_buy_deposits)
+    previous_buy_deposits[1:] = last_buy_deposits[:-1]
+    wallet_values = monthly_addition * (deposits - previous_buy_deposits)
+
+    final_value = value_after_buy[-1] if len(value_after_buy) else float(initial_investment)
+    return final_value, investment_values, wallet_values, dates[buy], value_after_buy[buy]
+
+
+def simulate_investment_vectorized(threshold, initial_investment, monthly_addition, nasdaq_data):
+    """Drop-in replacement for `simulate_investment` returning arrays instead of lists."""
+    dates, deposits, log_returns, cumulative_log_growth = strategy_arrays(nasdaq_data)
+    return strategy_paths(dates, deposits, log_returns, cumulative_log_growth, threshold,
+                          initial_investment, monthly_addition)
+
+
+def top_trajectories(nasdaq_data, table, initial_investment, top_k=5):
+    """Paths of the `top_k` best configurations of a result table, as compact arrays.
+
+    `table` has Threshold, Leverage, Monthly Addition and Final Value columns.
+    Thresholds between the same two daily returns buy on the same days, so rows with
+    the same final value are one path and only the first of them is kept. Returns the
+    kept rows (best first) with the dates and closes, and float32 investment and wallet
+    paths plus a boolean buy mask, one row per configuration.
+    """
+    ranked = table.sort_values('Final Value', ascending=False)
+    ranked = ranked.loc[ranked['Final Value'].round(2).drop_duplicates().index[:top_k]].reset_index(drop=True)
+    dates, deposits, log_returns, _ = strategy_arrays(nasdaq_data)
+    cumulative_log_returns = np.cumsum(log_returns)
+
+    investment_values = np.empty((len(ranked), len(dates)), dtype=np.float32)
+    wallet_values = np.empty((len(ranked), len(dates)), dtype=np.float32)
+    buys = np.zeros((len(ranked), len(dates)), dtype=bool)
+    for k, row in ranked.iterrows():
+        _, investment_values[k], wallet_values[k], buy_dates, _ = strategy_paths(
+            dates, deposits, log_returns, row['Leverage'] * cumulative_log_returns, row['Threshold'], initial_investment,
+            row['Monthly Addition'])
+        buys[k] = np.isin(dates, buy_dates)
+    return {
+        'configurations': ranked,
+        'dates': dates,
+        'close': nasdaq_data['Close'].to_numpy(dtype=np.float32),
+        'investment_values': investment_values,
+        'wallet_values': wallet_values,
+        'buys': buys,
+    }
+
+
+def evaluate_configurations(log_returns, deposits, cumulative_log_returns, thresholds, leverages, monthly_additions, initial_investment):
+    """Final values indexed [threshold, leverage, monthly addition].
+
+    `cumulative_log_returns` is the cumulative sum of the unleveraged log returns;
+    the leveraged position grows by `leverage` times as much.
+    """
+    leverages = np.atleast_1d(np.asarray(leverages, dtype=float))
+    monthly_additions = np.clip(np.atleast_1d(np.asarray(monthly_additions, dtype=float)), 0, None)
+    units = buy_schedule(log_returns, deposits, thresholds)
+    growth_to_end = np.exp(np.outer(leverages, cumulative_log_returns[-1] - cumulative_log_returns))
+    invested_growth = units @ growth_to_end.T
+    base_values = initial_investment * np.exp(leverages * cumulative_log_returns[-1])
+    return base_values[None, :, None] + invested_growth[:, :, None] * monthly_additions[None, None, :]
+
+
+def _neighbours(values, step, low, high):
+    return {min(max(value + offset, low), high) for value in values for offset in (-step, 0.0, step)}
+
+
+def adaptive_search(nasdaq_data, leverage_range, threshold_range, monthly_addition_values, initial_investment,
+                    coarse_points=11, rounds=4, keep=3, progress=None):
+    """Coarse-to-fine search over threshold, leverage and monthly addition.
+
+    Starts from a coarse threshold x leverage grid, then for `rounds` rounds halves
+    both steps and evaluates the neighbours of the `keep` best cells. Leverages are
+    integers in `leverage_range` (pass (L, L) to keep it fixed); every monthly addition
+    is evaluated for each cell since that axis is a broadcast. Returns a table of
+    every evaluated configuration and a summary with the number of evaluations next
+    to the size of the full grid at the final resolution.
+    """
+    _, deposits, log_returns, _ = strategy_arrays(nasdaq_data)
+    cumulative_log_returns = np.cumsum(log_returns)
+    monthly_addition_values = np.atleast_1d(np.asarray(monthly_addition_values, dtype=float))
+    threshold_low, threshold_high = threshold_range
+    leverage_low, leverage_high = leverage_range
+
+    threshold_step = (threshold_high - threshold_low) / (coarse_points - 1)
+    leverage_step = max(1, int(np.ceil((leverage_high - leverage_low) / 4)))
+    thresholds = set(np.linspace(threshold_low, threshold_high, coarse_points))
+    leverages = set(range(leverage_low, leverage_high + 1, leverage_step)) | {leverage_high}
+
+    evaluated = {}
+    for round_number in range(rounds + 1):
+        if round_number > 0:
+            threshold_step /= 2
+            leverage_step = max(1, leverage_step // 2)
+            best_cells = sorted(evaluated, key=lambda cell: evaluated[cell].max(), reverse=True)[:keep]
+            thresholds = _neighbours({cell[0] for cell in best_cells}, threshold_step, threshold_low, threshold_high)
+            leverages = {int(value) for value in _neighbours({cell[1] for cell in best_cells}, leverage_step, leverage_low, leverage_high)}
+
+        # Only evaluate cells not seen in an earlier round; thresholds missing the same
+        # leverages are evaluated together, so every product holds new cells only
+        groups = {}
+        for threshold in sorted({round(value, 12) for value in thresholds}):
+            new_leverages = tuple(sorted(leverage for leverage in leverages if (threshold, leverage) not in evaluated))
+            if new_leverages:
+                groups.setdefault(new_leverages, []).append(threshold)
+        for new_leverages, new_thresholds in groups.items():
+            final_values = evaluate_configurations(log_returns, deposits, cumulative_log_returns, new_thresholds, new_leverages,
+                                                   monthly_addition_values, initial_investment)
+            for i, threshold in enumerate(new_thresholds):
+                for j, leverage in enumerate(new_leverages):
+                    evaluated[(threshold, leverage)] = final_values[i, j]
+
+        if progress is not None:
+            best_cell = max(evaluated, key=lambda cell: evaluated[cell].max())
+            best_addition = int(np.argmax(evaluated[best_cell]))
+            progress((round_number + 1) / (rounds + 1), {'Threshold': best_cell[0], 'Leverage': best_cell[1],
+                                                        'Monthly Addition': monthly_addition_values[best_addition],
+                                                        'Final Value': evaluated[best_cell][best_addition]})
+
+    cells = list(evaluated)
+    table = pd.DataFrame({
+        'Threshold': np.repeat([cell[0] for cell in cells], len(monthly_addition_values)),
+        'Leverage': np.repeat([cell[1] for cell in cells], len(monthly_addition_values)),
+        'Monthly Addition': np.tile(monthly_addition_values, len(cells)),
+        'Final Value': np.concatenate([evaluated[cell] for cell in cells]),
+    })
+    full_grid_thresholds = int(round((threshold_high - threshold_low) / threshold_step)) + 1
+    summary = {
+        'evaluations': len(table),
+        'full_grid_evaluations': full_grid_thresholds * ((leverage_high - leverage_low) // leverage_step + 1) * len(monthly_addition_values),
+        'threshold_resolution': threshold_step,
+    }
+    return table, summary
@@ -3,16 +3,8 @@ import streamlit as st
 # Set page configuration
 st.set_page_config(page_title="Finance Dashboard", layout="wide")
 
-from volatility_prediction import show_volatility_prediction
-from investment_strategy import show_investment_strategy
-from prediction import show_prediction
-from streamlit_test import show_streamlit_test
-from monte_carlo import show_monte_carlo_simulation
-from hedging import show_hedging_strategy
-from log_returns import show_log_returns
-from show_investment_decision import show_investment_decision
-from sector_performance import show_performance_charts  # Added import for sector performance
-from best_performing_companies import show_best_performing_companies  # Added import for best-performing companies
+from page_registry import PAGES, load_page, import_time_report
+from instrumentation import MAX_RUNS_KEPT, page_run, profile_request, show_run_report, span
 
 # Custom CSS for a card-based layout
 card_layout_css = """
@@ -94,36 +86,21 @@ input[type="text"], input[type="number"], select {
 st.markdown(card_layout_css, unsafe_allow_html=True)
 
 st.sidebar.title("Navigation")
-selection = st.sidebar.selectbox("Go to", [
-    "Prediction", 
-    "Volatility Prediction", 
-    "Investment Strategy", 
-    "Portfolio Weight Optimization", 
-    "Hedging Strategy",
-    "Log Returns Analysis",
-    "Monte Carlo Simulation",
-    "Investment Decision",
-    "Sector Performance",  # Added sector performance to the selection
-    "Best Performing Companies"  # Added best-performing companies to the selection
-])
-
-if selection == "Prediction":
-    show_prediction()
-elif selection == "Volatility Prediction":
-    show_volatility_prediction()
-elif selection == "Investment Strategy":
-    show_investment_strategy()
-elif selection == "Portfolio Weight Optimization":
-    show_streamlit_test()
-elif selection == "Hedging Strategy":
-    show_hedging_strategy()
-elif selection == "Log Returns Analysis":
-    show_log_returns()
-elif selection == "Monte Carlo Simulation":
-    show_monte_carlo_simulation()
-elif selection == "Investment Decision":
-    show_investment_decision()
-elif selection == "Sector Performance":
-    show_performance_charts()  # Call the function for sector performance
-elif selection == "Best Performing Companies":
-    show_best_performing_companies()  # Call the function for best-performing companies
\ No newline at end of file
+selection = st.sidebar.selectbox("Go to", list(PAGES))
+
+performance = st.sidebar.expander("Performance")
+profiler = profile_request(performance)
+
+# Import the selected page (and its heavy dependencies) only now, then render it
+with page_run(selection, profiler) as run:
+    with span('import', selection):
+        show_page = load_page(selection)
+    show_page()
+
+runs = st.session_state.setdefault('instrumentation_runs', [])
+runs.append(run)
+del runs[:-MAX_RUNS_KEPT]
+show_run_report(performance, runs)
+
+with st.sidebar.expander("Page import times"):
+    st.table(import_time_report())
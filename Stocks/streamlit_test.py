@@ -1,42 +1,12 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import yfinance as yf
-from cvxopt import matrix, solvers
+from instrumentation import span
+from result_cache import cached_result
+from portfolio import (fetch_stock_data, calculate_returns_and_covariance, factor_covariance, efficient_frontier, frontier_weights,
+                       portfolio_variance, calculate_leveraged_portfolio_value, rolling_rebalance_backtest)
 import plotly.graph_objects as go
 
-def fetch_stock_data(tickers, start_date, end_date):
-    data = yf.download(tickers, start=start_date, end=end_date)
-    return data['Adj Close']
-
-def calculate_returns_and_covariance(data):
-    returns = data.pct_change().dropna()
-    mean_returns = returns.mean()
-    cov_matrix = returns.cov()
-    return returns, mean_returns, cov_matrix
-
-def optimize_portfolio(mean_returns, cov_matrix, risk_factor):
-    n = len(mean_returns)
-    risk_factor = max(1, min(risk_factor, 10))
-    adjusted_cov_matrix = cov_matrix * (10 - risk_factor) / 9.0
-    adjusted_mean_returns = mean_returns * risk_factor / 10.0
-    P = matrix(adjusted_cov_matrix.values)
-    q = matrix(-adjusted_mean_returns.values)
-    G = matrix(-np.eye(n))
-    h = matrix(np.zeros(n))
-    A = matrix(1.0, (1, n))
-    b = matrix(1.0)
-    solvers.options['show_progress'] = False
-    sol = solvers.qp(P, q, G, h, A, b)
-    weights = np.array(sol['x']).flatten()
-    return weights
-
-def calculate_leveraged_portfolio_value(data, weights, leverage_factor, initial_investment):
-    portfolio_returns = (data.pct_change().dropna() * weights).sum(axis=1)
-    leveraged_returns = portfolio_returns * leverage_factor
-    portfolio_value = initial_investment * (1 + leveraged_returns).cumprod()
-    return portfolio_value
-
 def show_streamlit_test():
     st.title('Portfolio Weight Optimization')
     tickers = st.text_input('Enter ticker symbols separated by commas:', 'AAPL,MSFT,GOOGL,AMZN,TSLA')
@@ -45,13 +15,31 @@ def show_streamlit_test():
     risk_factor = st.slider('Select your risk factor (1-10):', 1, 10, 5)
     leverage_factor = st.slider('Select your leverage factor (1-10):', 1, 10, 1)
     initial_investment = st.number_input('Enter your initial investment amount (€):', min_value=1000, step=1000, value=10000)
+    covariance_model = st.selectbox('Covariance model:', ['Sample covariance', 'Factor model'],
+                                    help='The factor model (10 statistical factors plus specific risk) stays stable and fast for hundreds of tickers.')
 
     tickers = [ticker.strip() for ticker in tickers.split(',')]
-    data = fetch_stock_data(tickers, start_date, end_date)
+    with span('fetch', f'{len(tickers)} tickers'):
+        data = fetch_stock_data(tickers, start_date, end_date)
 
     if not data.empty:
-        returns, mean_returns, cov_matrix = calculate_returns_and_covariance(data)
-        weights = optimize_portfolio(mean_returns, cov_matrix, risk_factor)
+        # The covariance and the optimum for every risk factor are computed once per ticker/date set,
+        # so moving the risk slider only looks up another point of the frontier
+        def optimize():
+            returns, mean_returns, cov_matrix = calculate_returns_and_covariance(data)
+            if covariance_model == 'Factor model':
+                factors = factor_covariance(returns)
+                return {'mean_returns': mean_returns.values, **factors, **efficient_frontier(mean_returns, factors)}
+            return {'mean_returns': mean_returns.values, 'cov_matrix': cov_matrix.values, **efficient_frontier(mean_returns, cov_matrix)}
+
+        with span('compute', 'efficient frontier'):
+            frontier = cached_result('portfolio_frontier', {'tickers': tickers, 'start': start_date, 'covariance_model': covariance_model},
+                                     data, optimize)
+        if covariance_model == 'Factor model':
+            covariance = {'loadings': frontier['loadings'], 'specific_variances': frontier['specific_variances']}
+        else:
+            covariance = frontier['cov_matrix']
+        weights = frontier_weights(frontier, risk_factor)
 
         st.write('Optimized Portfolio Weights:')
         for ticker, weight in zip(tickers, weights):
@@ -67,7 +55,8 @@ def show_streamlit_test():
             paper_bgcolor='rgba(0,0,0,0)', 
             plot_bgcolor='rgba(0,0,0,0)'
         )
-        st.plotly_chart(fig, use_container_width=True)
+        with span('render', 'portfolio value chart'):
+            st.plotly_chart(fig, use_container_width=True)
 
         fig = go.Figure()
         fig.add_trace(go.Bar(x=tickers, y=weights, name='Weights'))
@@ -78,7 +67,23 @@ def show_streamlit_test():
             paper_bgcolor='rgba(0,0,0,0)', 
             plot_bgcolor='rgba(0,0,0,0)'
         )
-        st.plotly_chart(fig, use_container_width=True)
+        with span('render', 'weights chart'):
+            st.plotly_chart(fig, use_container_width=True)
+
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=frontier['volatilities'], y=frontier['expected_returns'], mode='lines+markers', name='Efficient Frontier',
+                                 text=[f'Risk factor {r:g}' for r in frontier['risk_factors']]))
+        fig.add_trace(go.Scatter(x=np.sqrt(portfolio_variance(weights, covariance)), y=[weights @ frontier['mean_returns']],
+                                 mode='markers', name=f'Risk Factor {risk_factor}', marker=dict(size=12, color='red')))
+        fig.update_layout(
+            title='Efficient Frontier',
+            xaxis_title='Daily Volatility',
+            yaxis_title='Expected Daily Return',
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)'
+        )
+        with span('render', 'frontier chart'):
+            st.plotly_chart(fig, use_container_width=True)
 
         # Add personalized explanation
         st.write(f"""
@@ -96,10 +101,75 @@ def show_streamlit_test():
           and the x-axis represents the dates within the specified range.
         - The second chart shows the optimized weights for each ticker in the portfolio. The y-axis indicates the weights, 
           and the x-axis lists the ticker symbols.
+        - The third chart shows the efficient frontier: the expected daily return and volatility of the optimal portfolio 
+          for every risk factor, with your selection marked in red.
 
         By analyzing these results, you can understand how different weights and leverage factors affect your portfolio's performance 
         and make informed investment decisions.
         """)
+
+        st.subheader('Rolling Rebalance Backtest')
+        st.write('The weights above are optimized with hindsight over the whole period. The backtest instead re-optimizes '
+                 'them at every rebalance using only the preceding estimation window, with the selected covariance model.')
+        col1, col2 = st.columns(2)
+        with col1:
+            window = st.number_input('Estimation window (trading days):', min_value=20, value=126, step=21)
+        with col2:
+            frequency = st.selectbox('Rebalance frequency:', ['Weekly', 'Daily', 'Monthly'])
+        if st.checkbox('Run the backtest'):
+            rebalance_every = {'Daily': 1, 'Weekly': 5, 'Monthly': 21}[frequency]
+
+            def backtest():
+                result = rolling_rebalance_backtest(data, risk_factor, leverage_factor, initial_investment, window, rebalance_every,
+                                                    covariance_model='factor' if covariance_model == 'Factor model' else 'sample')
+                return {'portfolio_value': result['portfolio_value'].to_frame('Portfolio Value'), 'weights': result['weights'],
+                        'turnover': result['turnover'].to_frame('Turnover'), 'summary': result['summary']}
+
+            try:
+                with span('compute', 'rolling rebalance backtest'):
+                    result = cached_result('portfolio_backtest', {'tickers': tickers, 'start': start_date, 'risk_factor': risk_factor,
+                                                                  'leverage_factor': leverage_factor, 'initial_investment': initial_investment,
+                                                                  'window': window, 'rebalance_every': rebalance_every,
+                                                                  'covariance_model': covariance_model},
+                                           data, backtest)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                summary = result['summary']
+                st.write(f"""
+                {summary['rebalances']} rebalances, average turnover {summary['average_turnover']:.1%} per rebalance
+                ({summary['annual_turnover']:.0%} per year), {summary['average_qp_iterations']:.1f} solver iterations per rebalance.
+                """)
+
+                backtest_value = result['portfolio_value']['Portfolio Value']
+                fig = go.Figure()
+                fig.add_trace(go.Scatter(x=backtest_value.index, y=backtest_value.values, mode='lines', name=f'Rolling Rebalance ({frequency})'))
+                # Hindsight weights over the same dates, starting from the same amount
+                hindsight_value = portfolio_value[portfolio_value.index >= backtest_value.index[0]]
+                fig.add_trace(go.Scatter(x=hindsight_value.index, y=hindsight_value.values / hindsight_value.iloc[0] * backtest_value.iloc[0],
+                                         mode='lines', name='Hindsight Weights', line=dict(dash='dash')))
+                fig.update_layout(
+                    title=f'Rolling Rebalance Backtest with {leverage_factor}x Leverage',
+                    xaxis_title='Date',
+                    yaxis_title='Portfolio Value (€)',
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    plot_bgcolor='rgba(0,0,0,0)'
+                )
+                with span('render', 'backtest chart'):
+                    st.plotly_chart(fig, use_container_width=True)
+
+                fig = go.Figure()
+                fig.add_trace(go.Bar(x=result['turnover'].index, y=result['turnover']['Turnover'], name='Turnover'))
+                fig.update_layout(
+                    title='Turnover at Each Rebalance',
+                    xaxis_title='Date',
+                    yaxis_title='Turnover',
+                    yaxis_tickformat='.0%',
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    plot_bgcolor='rgba(0,0,0,0)'
+                )
+                with span('render', 'turnover chart'):
+                    st.plotly_chart(fig, use_container_width=True)
     else:
         st.write('No data available for the selected tickers and date range.')
 
@@ -1,10 +1,12 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import yfinance as yf
+from data_store import fetch_data
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from arch import arch_model
+from instrumentation import span
+from garch_search import VOLATILITY_MODELS, DISTRIBUTIONS, RETURN_SCALE, build_model, forecast_volatility, garch_search_space, search_garch_orders, spec_label
+from result_cache import cached_result
 import statsmodels.api as sm
 import scipy.stats as stats
 
@@ -15,51 +17,47 @@ def show_volatility_prediction():
     start_date = st.date_input("Start date:", value=pd.to_datetime("2021-04-01"))
     end_date = st.date_input("End date:", value=pd.to_datetime('today'))  # Default to the current day
 
-    @st.cache_data
-    def fetch_data(ticker, start, end):
-        data = yf.download(ticker, start=start, end=end)
-        data.reset_index(inplace=True)
-        return data
+    with st.expander("Model search space"):
+        models = st.multiselect("Volatility models:", list(VOLATILITY_MODELS), default=['GARCH'])
+        distributions = st.multiselect("Innovation distributions:", list(DISTRIBUTIONS), default=['normal'],
+                                       format_func=lambda dist: DISTRIBUTIONS[dist])
+        max_p = st.slider("Maximum ARCH order p:", 1, 5, 3)
+        max_q = st.slider("Maximum GARCH order q:", 1, 5, 3)
 
-    nasdaq_data = fetch_data(ticker, start_date, end_date)
+    with span('fetch', ticker):
+        nasdaq_data = fetch_data(ticker, start_date, end_date)
 
     nasdaq_data['Log Returns'] = np.log(nasdaq_data['Close'] / nasdaq_data['Close'].shift(1))
     nasdaq_data.dropna(inplace=True)
 
-    # Define a function to fit the model and return the AIC for model comparison
-    def fit_garch_model(p, q):
-        model = arch_model(nasdaq_data['Log Returns'], vol='Garch', p=p, q=q)
-        model_fit = model.fit(disp='off')
-        return model_fit.aic, model_fit
-
-    # Hyperparameter tuning for the GARCH model
-    p_values = range(1, 4)
-    q_values = range(1, 4)
-    best_aic = float('inf')
-    best_pq = None
-    best_model_fit = None
-
-    for p in p_values:
-        for q in q_values:
-            aic, model_fit = fit_garch_model(p, q)
-            if aic < best_aic:
-                best_aic = aic
-                best_pq = (p, q)
-                best_model_fit = model_fit
-
-    st.write(f"Best GARCH model order: {best_pq} with AIC: {best_aic:.2f}")
-
-    # Fit the best GARCH model
-    best_p, best_q = best_pq
-    volatility = best_model_fit.conditional_volatility
+    # Hyperparameter tuning: fit every specification, warm-starting larger orders
+    specs = garch_search_space(range(1, max_p + 1), range(1, max_q + 1), models or ['GARCH'], distributions or ['normal'])
+
+    def garch_search():
+        search_results, best_spec, best_model_fit = search_garch_orders(nasdaq_data['Log Returns'], specs)
+        return {'search_results': search_results, 'best_spec': list(best_spec), 'best_params': best_model_fit.params.to_numpy()}
+
+    with span('compute', f'GARCH search ({len(specs)} models)'):
+        # The search result is stored for this data; the best model is rebuilt from its fitted parameters,
+        # which are only valid for the return scale they were fitted at
+        search = cached_result('garch_search', {'ticker': ticker, 'start': start_date, 'specs': specs, 'scale': RETURN_SCALE},
+                               nasdaq_data[['Date', 'Close']], garch_search)
+        search_results, best_spec = search['search_results'], tuple(search['best_spec'])
+        best_model_fit = build_model(nasdaq_data['Log Returns'], best_spec).fix(search['best_params'])
+
+    st.write(f"Best model: {spec_label(best_spec)} with AIC: {best_model_fit.aic:.2f}")
+    with st.expander("All fitted models"):
+        st.dataframe(search_results)
+
+    volatility = best_model_fit.conditional_volatility / RETURN_SCALE
 
     forecast_horizon = 30
-    forecast = best_model_fit.forecast(horizon=forecast_horizon)
-    forecast_volatility = forecast.variance.values[-1, :] ** 0.5
+    with span('compute', 'volatility forecast'):
+        forecasted_volatility = forecast_volatility(best_model_fit, forecast_horizon)
 
     last_date = nasdaq_data['Date'].iloc[-1]
     forecast_dates = pd.date_range(last_date, periods=forecast_horizon + 1, inclusive='right')
-    forecast_df = pd.DataFrame({'Date': forecast_dates, 'Forecasted Volatility': forecast_volatility})
+    forecast_df = pd.DataFrame({'Date': forecast_dates, 'Forecasted Volatility': forecasted_volatility})
 
     merged_data = pd.DataFrame({
         'Date': nasdaq_data['Date'],
@@ -86,7 +84,8 @@ def show_volatility_prediction():
         plot_bgcolor='rgba(0,0,0,0)'
     )
 
-    st.plotly_chart(fig, use_container_width=True)
+    with span('render', 'volatility chart'):
+        st.plotly_chart(fig, use_container_width=True)
 
     st.write(f"Correlation between NASDAQ Price and Volatility: {correlation:.2f}")
 
@@ -96,7 +95,8 @@ def show_volatility_prediction():
 
     # Ljung-Box test
     st.write("Ljung-Box test p-values for residuals:")
-    lb_test = sm.stats.acorr_ljungbox(residuals, lags=[10], return_df=True)
+    with span('compute', 'Ljung-Box test'):
+        lb_test = sm.stats.acorr_ljungbox(residuals, lags=[10], return_df=True)
     st.write(lb_test)
 
     # Plot standardized residuals
@@ -111,11 +111,13 @@ def show_volatility_prediction():
         paper_bgcolor='rgba(0,0,0,0)',
         plot_bgcolor='rgba(0,0,0,0)'
     )
-    st.plotly_chart(fig_resid, use_container_width=True)
+    with span('render', 'residuals chart'):
+        st.plotly_chart(fig_resid, use_container_width=True)
 
     # QQ plot of residuals using Plotly
     st.subheader("QQ Plot of Residuals")
-    qq = sm.qqplot(residuals, line='s')
+    with span('compute', 'QQ plot'):
+        qq = sm.qqplot(residuals, line='s')
     qq_data = qq.gca().lines
     qq_x = qq_data[0].get_xdata()
     qq_y = qq_data[0].get_ydata()
@@ -133,7 +135,8 @@ def show_volatility_prediction():
         paper_bgcolor='rgba(0,0,0,0)',
         plot_bgcolor='rgba(0,0,0,0)'
     )
-    st.plotly_chart(fig_qq, use_container_width=True)
+    with span('render', 'QQ chart'):
+        st.plotly_chart(fig_qq, use_container_width=True)
 
     # Histogram of residuals
     st.subheader("Histogram of Residuals")
@@ -148,6 +151,7 @@ def show_volatility_prediction():
         paper_bgcolor='rgba(0,0,0,0)',
         plot_bgcolor='rgba(0,0,0,0)'
     )
-    st.plotly_chart(fig_hist, use_container_width=True)
+    with span('render', 'residual histogram'):
+        st.plotly_chart(fig_hist, use_container_width=True)
 
 # To use the updated function, ensure this is called in your main Streamlit app.
\ No newline at end of file
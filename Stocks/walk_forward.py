@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from strategy_engine import buy_schedule, prepare_strategy_data, strategy_arrays, sweep_final_values
+
+# Walk-forward (out-of-sample) evaluation of the threshold-buying strategy.
+#
+# The date range is split into rolling folds: the parameter grid is swept on a train
+# window, and the best (threshold, monthly addition) pair is then run on the test
+# window that follows it. Consecutive test windows do not overlap, so together they
+# show what choosing parameters from the past would have earned.
+#
+# Windows are scored by their annualized money-weighted return (the internal rate of
+# return of the initial investment and the monthly deposits against the final value,
+# counting deposits still waiting in the wallet as cash). Dividing a final value that
+# includes every deposit by the initial investment alone would mostly measure the
+# deposits, and would always pick the largest addition.
+#
+# A fold only takes milliseconds, so folds run serially unless there are enough of
+# them to pay for a process pool.
+
+# Use a process pool only from this many folds on
+MIN_PARALLEL_FOLDS = 200
+# Bisection steps of the money-weighted return (on the log growth rate)
+IRR_ITERATIONS = 100
+
+
+def walk_forward_folds(dates, train_months=12, test_months=3):
+    """(train start, test start, test end) of every fold that fits in `dates`."""
+    dates = pd.to_datetime(pd.Series(dates))
+    first, last = dates.min(), dates.max() + pd.Timedelta(days=1)
+    folds = []
+    train_start = first
+    while True:
+        test_start = train_start + pd.DateOffset(months=train_months)
+        test_end = test_start + pd.DateOffset(months=test_months)
+        if test_end > last:
+            break
+        folds.append((train_start, test_start, test_end))
+        train_start += pd.DateOffset(months=test_months)
+    return folds
+
+
+def money_weighted_returns(window, threshold_values, monthly_addition_values, initial_investment, start, end):
+    """Final values and annualized money-weighted returns of every (threshold, monthly addition) pair on `window`.
+
+    `window` holds the prepared strategy columns of the days in [start, end). The cash
+    flows are the initial investment at `start` and the monthly addition on every
+    deposit day; the final value at `end` includes the deposits not invested yet. Both
+    results are indexed [threshold, monthly addition].
+    """
+    additions = np.clip(np.asarray(monthly_addition_values, dtype=float), 0, None)
+    shape = (len(threshold_values), len(additions))
+    if len(window) == 0:
+        return np.full(shape, float(initial_investment)), np.zeros(shape)
+    dates, deposits, log_returns, cumulative_log_growth = strategy_arrays(window)
+    uninvested = deposits[-1] - buy_schedule(log_returns, deposits, threshold_values).sum(axis=1)
+    final_values = (sweep_final_values(log_returns, deposits, cumulative_log_growth, threshold_values, additions, initial_investment)
+                    + np.outer(uninvested, additions))
+
+    horizon = (end - start).days / 365.25
+    deposit_days = dates[np.diff(deposits, prepend=0) > 0]
+    years_to_end = horizon - (deposit_days - start.to_datetime64()) / np.timedelta64(1, 'D') / 365.25
+    # The value the cash flows reach at log growth rate g increases with g, so bisect on it
+    low, high = np.full(shape, -50.0), np.full(shape, 50.0)
+    for _ in range(IRR_ITERATIONS):
+        rate = (low + high) / 2
+        value = (initial_investment * np.exp(rate * horizon)
+                 + additions * np.exp(rate[..., None] * years_to_end).sum(axis=-1))
+        too_high = value > final_values
+        high = np.where(too_high, rate, high)
+        low = np.where(too_high, low, rate)
+    return final_values, np.expm1((low + high) / 2)
+
+
+def evaluate_fold(train, test, fold, threshold_values, monthly_addition_values, initial_investment):
+    """Sweep the train window of `fold` and score its best parameters on the test window."""
+    train_start, test_start, test_end = fold
+    train_values, train_returns = money_weighted_returns(train, threshold_values, monthly_addition_values, initial_investment,
+                                                         train_start, test_start)
+    i, j = np.unravel_index(np.argmax(train_returns), train_returns.shape)
+    threshold, monthly_addition = threshold_values[i], monthly_addition_values[j]
+    test_values, test_returns = money_weighted_returns(test, threshold_values[i:i + 1], monthly_addition_values[j:j + 1],
+                                                       initial_investment, test_start, test_end)
+
+    return {
+        'Train Start': train_start,
+        'Test Start': test_start,
+        'Test End': test_end,
+        'Threshold': threshold,
+        'Monthly Addition': monthly_addition,
+        'In-sample Final Value': train_values[i, j],
+        'In-sample Return': train_returns[i, j],
+        'Out-of-sample Final Value': test_values[0, 0],
+        'Out-of-sample Return': test_returns[0, 0],
+    }
+
+
+def walk_forward(nasdaq_data, leverage_factor, threshold_values, monthly_addition_values, initial_investment,
+                 train_months=12, test_months=3, max_workers=None, progress=None):
+    """Evaluate every fold.
+
+    Returns one row per fold and a summary comparing the in-sample and out-of-sample
+    money-weighted returns. `progress(fraction, summary)` is called as folds finish.
+    """
+    folds = walk_forward_folds(nasdaq_data['Date'], train_months, test_months)
+    if not folds:
+        raise ValueError(f"The date range is too short for a {train_months} month train and {test_months} month test window")
+    threshold_values = np.asarray(threshold_values, dtype=float)
+    monthly_addition_values = np.asarray(monthly_addition_values, dtype=float)
+    # Returns are computed on the whole series so each window keeps its first day's return
+    data = prepare_strategy_data(nasdaq_data[['Date', 'Close']].copy(), leverage_factor)
+    dates = pd.to_datetime(data['Date'])
+
+    def fold_arguments(fold):
+        train_start, test_start, test_end = fold
+        train = data[(dates >= train_start) & (dates < test_start)]
+        test = data[(dates >= test_start) & (dates < test_end)]
+        return train, test, fold, threshold_values, monthly_addition_values, initial_investment
+
+    rows = []
+
+    def add_row(row):
+        rows.append(row)
+        if progress is not None:
+            progress(len(rows) / len(folds), summarize_folds(pd.DataFrame(rows)))
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(folds))
+    if len(folds) < MIN_PARALLEL_FOLDS or max_workers == 1:
+        for fold in folds:
+            add_row(evaluate_fold(*fold_arguments(fold)))
+    else:
+        # Spawned workers: this may run in a thread of the multithreaded dashboard, which must not be forked
+        executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            futures = [executor.submit(evaluate_fold, *fold_arguments(fold)) for fold in folds]
+            for future in as_completed(futures):
+                add_row(future.result())
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    folds_df = pd.DataFrame(rows).sort_values('Test Start').reset_index(drop=True)
+    return folds_df, summarize_folds(folds_df)
+
+
+def summarize_folds(folds_df):
+    # Medians, since annualizing short test windows makes the means very noisy
+    return {
+        'folds': len(folds_df),
+        'median_in_sample_return': folds_df['In-sample Return'].median(),
+        'median_out_of_sample_return': folds_df['Out-of-sample Return'].median(),
+        'positive_out_of_sample_folds': int((folds_df['Out-of-sample Return'] > 0).sum()),
+    }